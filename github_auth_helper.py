@@ -0,0 +1,193 @@
+import datetime as dt
+import threading
+import time
+
+import requests
+
+from log_helper import app_log as log
+
+github_api_url = "https://api.github.com"
+# Le installation token durano un'ora: si rinnovano qualche minuto prima
+installation_token_refresh_margin = 300
+
+credential_lock = threading.Lock()
+# Credenziali in ordine di preferenza: prima la Github App, poi i token personali
+credentials = []
+credentials_by_token = {}
+
+
+def github_credentials_load(
+    token: str = None,
+    tokens: str = None,
+    app_id: str = None,
+    private_key: str = None,
+    installation_id: str = None,
+    org: str = None,
+):
+    """
+    Register the Github credentials of the run: an optional Github App installation
+    and any number of personal access tokens (comma or newline separated)
+    """
+
+    if app_id and private_key:
+        credentials.append(
+            {
+                "name": f"app {app_id}",
+                "app_id": str(app_id),
+                # I secret incollati su una riga arrivano con "\n" letterali
+                "private_key": private_key.replace("\\n", "\n"),
+                "installation_id": installation_id or None,
+                "org": org,
+                "token": None,
+                "expires_at": 0,
+                "limits": {},
+            }
+        )
+    extra_tokens = [t.strip() for t in (tokens or "").replace("\n", ",").split(",")]
+    pats = [t for t in [token] + extra_tokens if t]
+    for i, pat in enumerate(pats):
+        if pat not in credentials_by_token:
+            credential = {"name": f"token {i}", "token": pat, "limits": {}}
+            credentials.append(credential)
+            credentials_by_token[pat] = credential
+
+
+def github_app_jwt(credential: dict) -> str:
+    """
+    Sign the short-lived JWT that authenticates as the Github App itself
+    """
+
+    import jwt  # PyJWT, serve solo se è configurata una Github App
+
+    now = int(time.time())
+    payload = {"iat": now - 60, "exp": now + 540, "iss": credential["app_id"]}
+    return jwt.encode(payload, credential["private_key"], algorithm="RS256")
+
+
+def github_app_headers(credential: dict) -> dict:
+    return {
+        "Authorization": "Bearer " + github_app_jwt(credential),
+        "Accept": "application/vnd.github+json",
+    }
+
+
+def github_installation_id(credential: dict):
+    if credential["installation_id"]:
+        return credential["installation_id"]
+    response = requests.get(
+        f"{github_api_url}/orgs/{credential['org']}/installation",
+        headers=github_app_headers(credential),
+    )
+    if response.status_code != 200:
+        log.error(
+            f"[red]Github App {credential['app_id']} non installata su {credential['org']}: {response.status_code} {response.text}"
+        )
+        return None
+    credential["installation_id"] = str(response.json()["id"])
+    return credential["installation_id"]
+
+
+def github_installation_token_refresh(credential: dict) -> bool:
+    """
+    Mint a new installation token for a Github App credential
+    """
+
+    installation_id = github_installation_id(credential)
+    if installation_id is None:
+        credential["disabled"] = True
+        return False
+    response = requests.post(
+        f"{github_api_url}/app/installations/{installation_id}/access_tokens",
+        headers=github_app_headers(credential),
+    )
+    if response.status_code != 201:
+        log.error(
+            f"[red]Impossibile ottenere il token di installazione della Github App {credential['app_id']}: {response.status_code} {response.text}"
+        )
+        credential["disabled"] = True
+        return False
+    data = response.json()
+    credentials_by_token.pop(credential["token"], None)
+    credential["token"] = data["token"]
+    credential["expires_at"] = dt.datetime.fromisoformat(
+        data["expires_at"].replace("Z", "+00:00")
+    ).timestamp()
+    credentials_by_token[credential["token"]] = credential
+    log.info(f"[green]Github App {credential['app_id']}: installation token rinnovato")
+    return True
+
+
+def github_credential_budget(credential: dict, resource: str) -> float:
+    # Senza risposte ancora osservate, o a finestra scaduta, il budget è pieno
+    limit = credential["limits"].get(resource)
+    if limit is None or limit["reset"] <= time.time():
+        return float("inf")
+    return limit["remaining"]
+
+
+def github_credentials_remaining(resource: str = "core") -> float:
+    """
+    Total remaining rate limit budget for a resource over all usable credentials
+    """
+
+    with credential_lock:
+        return sum(
+            github_credential_budget(c, resource)
+            for c in credentials
+            if not c.get("disabled")
+        )
+
+
+def github_credential_token(resource: str = "core"):
+    """
+    Return the token with the most remaining rate limit budget for a resource
+    (core, graphql, search), refreshing installation tokens before they expire
+    """
+
+    with credential_lock:
+        while True:
+            usable = [c for c in credentials if not c.get("disabled")]
+            if not usable:
+                return None
+            credential = max(
+                usable, key=lambda c: github_credential_budget(c, resource)
+            )
+            if "app_id" in credential and (
+                credential["expires_at"] - installation_token_refresh_margin < time.time()
+            ):
+                if not github_installation_token_refresh(credential):
+                    continue
+            if github_credential_budget(credential, resource) == 0:
+                log.warning(
+                    f"[yellow]Rate limit '{resource}' esaurito per tutte le credenziali Github"
+                )
+            return credential["token"]
+
+
+def github_credential_observe(response: requests.Response, *args, **kwargs):
+    """
+    Session response hook: record the rate limit headers against the credential used
+    """
+
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is None:
+        return
+    authorization = response.request.headers.get("Authorization", "")
+    credential = credentials_by_token.get(authorization.removeprefix("Bearer "))
+    if credential is None:
+        return
+    resource = response.headers.get("X-RateLimit-Resource", "core")
+    with credential_lock:
+        credential["limits"][resource] = {
+            "remaining": int(remaining),
+            "reset": float(response.headers.get("X-RateLimit-Reset") or 0),
+        }
+
+
+def github_credentials_report():
+    for credential in credentials:
+        limits = ", ".join(
+            f"{resource} {limit['remaining']}"
+            for resource, limit in sorted(credential["limits"].items())
+        )
+        log.info(f"[green]Github {credential['name']}: remaining {limits or 'n/a'}")
@@ -0,0 +1,182 @@
+import datetime as dt
+import json
+import math
+import os
+import time
+
+from log_helper import app_log as log
+from state_helper import state_load, state_save
+
+metrics_dir = os.environ.get("SYNC_METRICS_DIR") or ".sync_metrics"
+# Le coppie già allineate vengono dimenticate dopo questo tempo
+freshness_retention = 30 * 24 * 3600
+
+freshdesk_to_github = "freshdesk_to_github"
+github_to_freshdesk = "github_to_freshdesk"
+
+# Stato di ogni coppia ticket/direzione, conservato tra un run e l'altro
+freshness = {"pairs": {}}
+# Ritardi misurati in questo run, uno per coppia
+freshness_samples = {}
+freshness_run_started = time.time()
+
+
+def freshness_key(ticket_id, direction: str) -> str:
+    return f"{ticket_id}|{direction}"
+
+
+def freshness_timestamp(value: str):
+    if not value:
+        return None
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def freshness_load():
+    freshness["pairs"] = state_load("freshness").get("pairs", {})
+
+
+def freshness_mark(ticket_id, direction: str, status: str, source_at: str = None):
+    key = freshness_key(ticket_id, direction)
+    pair = freshness["pairs"].setdefault(key, {})
+    pair["status"] = status
+    if source_at:
+        pair["source_at"] = source_at
+    pair["checked_at"] = time.time()
+    return pair
+
+
+def freshness_written(ticket_id, direction: str, source_at: str = None):
+    """
+    Record that a change was written to the other system, with its lag from the
+    source change time (taken from the pending record when not given).
+    A pair whose write already failed in this run stays out of sync
+    """
+
+    pair = freshness["pairs"].get(freshness_key(ticket_id, direction))
+    if pair and pair["status"] == "out_of_sync" and pair["checked_at"] >= freshness_run_started:
+        return
+    pair = freshness_mark(ticket_id, direction, "synced", source_at)
+    pair["written_at"] = pair["checked_at"]
+    source = freshness_timestamp(pair.get("source_at"))
+    if source is None:
+        return
+    pair["lag"] = max(0.0, pair["written_at"] - source)
+    freshness_samples[freshness_key(ticket_id, direction)] = (direction, pair["lag"])
+
+
+def freshness_pending(ticket_id, direction: str, source_at: str = None):
+    freshness_mark(ticket_id, direction, "pending", source_at)
+
+
+def freshness_out_of_sync(ticket_id, direction: str, source_at: str = None):
+    freshness_mark(ticket_id, direction, "out_of_sync", source_at)
+
+
+def freshness_checked(ticket_id, direction: str):
+    # Coppia controllata senza modifiche da scrivere: è allineata, salvo esiti di questo run
+    key = freshness_key(ticket_id, direction)
+    if key in freshness_samples:
+        return
+    pair = freshness["pairs"].get(key)
+    if pair and pair["status"] != "synced" and pair["checked_at"] < freshness_run_started:
+        pair["status"] = "synced"
+        pair["checked_at"] = time.time()
+
+
+def freshness_percentile(values: list, percentile: float):
+    # Nearest rank sulla lista ordinata
+    if not values:
+        return None
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def freshness_summary() -> dict:
+    directions = {}
+    for direction in (freshdesk_to_github, github_to_freshdesk):
+        lags = sorted(lag for d, lag in freshness_samples.values() if d == direction)
+        directions[direction] = {
+            "samples": len(lags),
+            "lag_seconds_sum": sum(lags),
+            "lag_seconds": {
+                "p50": freshness_percentile(lags, 50),
+                "p95": freshness_percentile(lags, 95),
+                "max": lags[-1] if lags else None,
+            },
+        }
+    counts = {"pending": 0, "out_of_sync": 0}
+    for pair in freshness["pairs"].values():
+        if pair["status"] in counts:
+            counts[pair["status"]] += 1
+    return {"generated_at": time.time(), "directions": directions, "pairs": counts}
+
+
+def freshness_prometheus(summary: dict) -> str:
+    lines = [
+        "# HELP freshdesk_sync_lag_seconds Lag between a source change and its write to the other system, in the last run",
+        "# TYPE freshdesk_sync_lag_seconds summary",
+    ]
+    for direction, values in summary["directions"].items():
+        for quantile, name in (("0.5", "p50"), ("0.95", "p95")):
+            if values["lag_seconds"][name] is not None:
+                lines.append(
+                    f'freshdesk_sync_lag_seconds{{direction="{direction}",quantile="{quantile}"}} {values["lag_seconds"][name]:.3f}'
+                )
+        lines.append(f'freshdesk_sync_lag_seconds_sum{{direction="{direction}"}} {values["lag_seconds_sum"]:.3f}')
+        lines.append(f'freshdesk_sync_lag_seconds_count{{direction="{direction}"}} {values["samples"]}')
+    lines += [
+        "# HELP freshdesk_sync_lag_max_seconds Largest lag between a source change and its write, in the last run",
+        "# TYPE freshdesk_sync_lag_max_seconds gauge",
+    ]
+    for direction, values in summary["directions"].items():
+        if values["lag_seconds"]["max"] is not None:
+            lines.append(
+                f'freshdesk_sync_lag_max_seconds{{direction="{direction}"}} {values["lag_seconds"]["max"]:.3f}'
+            )
+    lines += [
+        "# HELP freshdesk_sync_pairs Ticket/direction pairs still waiting for a write, or whose last write failed",
+        "# TYPE freshdesk_sync_pairs gauge",
+    ]
+    for status, count in summary["pairs"].items():
+        lines.append(f'freshdesk_sync_pairs{{status="{status}"}} {count}')
+    lines += [
+        "# HELP freshdesk_sync_last_run_timestamp_seconds End time of the last sync run",
+        "# TYPE freshdesk_sync_last_run_timestamp_seconds gauge",
+        f"freshdesk_sync_last_run_timestamp_seconds {summary['generated_at']:.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def freshness_export(save_state: bool = True) -> dict:
+    """
+    Save the pair states and write the run's freshness metrics as JSON and Prometheus text.
+    Runs that do not hold the lease only write the metrics
+    """
+
+    now = time.time()
+    freshness["pairs"] = {
+        key: pair
+        for key, pair in freshness["pairs"].items()
+        if pair["status"] != "synced" or pair["checked_at"] > now - freshness_retention
+    }
+    if save_state:
+        state_save("freshness", freshness)
+    summary = freshness_summary()
+    summary["stale_pairs"] = {
+        key: pair for key, pair in freshness["pairs"].items() if pair["status"] != "synced"
+    }
+    os.makedirs(metrics_dir, exist_ok=True)
+    with open(os.path.join(metrics_dir, "freshness.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    with open(os.path.join(metrics_dir, "freshness.prom"), "w", encoding="utf-8") as f:
+        f.write(freshness_prometheus(summary))
+    for direction, values in summary["directions"].items():
+        lag = values["lag_seconds"]
+        if values["samples"]:
+            log.info(
+                f"[green]Freshness {direction}: {values['samples']} writes, lag p50 {lag['p50']:.0f}s, p95 {lag['p95']:.0f}s, max {lag['max']:.0f}s"
+            )
+    log.info(
+        f"[green]Freshness: {summary['pairs']['pending']} pending, {summary['pairs']['out_of_sync']} out of sync"
+    )
+    return summary
+
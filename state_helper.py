@@ -0,0 +1,99 @@
+import contextlib
+import fcntl
+import json
+import os
+import socket
+import time
+import uuid
+
+state_dir = os.environ.get("SYNC_STATE_DIR") or ".sync_state"
+# Distingue due processi dello stesso run (stesso host e GITHUB_RUN_ID)
+lease_token = uuid.uuid4().hex[:8]
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def state_path(name: str) -> str:
+    return os.path.join(state_dir, name + ".json")
+
+
+def state_load(name: str) -> dict:
+    """
+    Load a named state document, or an empty dict if it does not exist
+    """
+
+    try:
+        with open(state_path(name), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def state_save(name: str, state: dict):
+    """
+    Write a named state document atomically, so a crash never leaves it half written
+    """
+
+    os.makedirs(state_dir, exist_ok=True)
+    tmp_path = state_path(name) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path(name))
+
+
+def state_clear(name: str):
+    try:
+        os.remove(state_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.environ.get('GITHUB_RUN_ID') or os.getpid()}:{lease_token}"
+
+
+@contextlib.contextmanager
+def lease_locked():
+    # Lock esclusivo sul file accanto al lease: lettura, controllo e scrittura
+    # del lease non si intrecciano con quelle di un altro run
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, "lease.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def lease_acquire(ttl: int) -> bool:
+    """
+    Take the run lease, unless another owner holds one that has not expired yet
+    """
+
+    with lease_locked():
+        lease = state_load("lease")
+        if lease and lease["owner"] != lease_owner() and lease["expires_at"] > time.time():
+            return False
+        state_save("lease", {"owner": lease_owner(), "expires_at": time.time() + ttl})
+        return True
+
+
+def lease_renew(ttl: int):
+    """
+    Extend the run lease, raising LeaseLost if it expired and another run took it
+    """
+
+    with lease_locked():
+        lease = state_load("lease")
+        if lease.get("owner") != lease_owner():
+            raise LeaseLost(f"Lease del run perso, ora di {lease.get('owner') or 'nessuno'}")
+        state_save("lease", {"owner": lease_owner(), "expires_at": time.time() + ttl})
+
+
+def lease_release():
+    with lease_locked():
+        lease = state_load("lease")
+        if lease.get("owner") == lease_owner():
+            state_clear("lease")
@@ -2,29 +2,225 @@ import requests
 import json
 import os
 import ast
+import argparse
+import hashlib
+import re
 import datetime as dt
+import time
+import math
+import dataclasses
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
 from log_helper import app_log as log
+from github_auth_helper import (
+    github_credentials_load,
+    github_credential_token,
+    github_credential_observe,
+    github_credentials_report,
+    github_credentials_remaining,
+)
+from metrics_helper import (
+    freshdesk_to_github,
+    github_to_freshdesk,
+    freshness_load,
+    freshness_written,
+    freshness_pending,
+    freshness_out_of_sync,
+    freshness_checked,
+    freshness_export,
+)
+from state_helper import (
+    state_load,
+    state_save,
+    state_clear,
+    lease_acquire,
+    lease_renew,
+    lease_release,
+    LeaseLost,
+)
 
 # OPTIONS:
 github_token = os.environ.get("GITHUB_TOKEN")
+github_tokens = os.environ.get("GITHUB_TOKENS")
+github_app_id = os.environ.get("GITHUB_APP_ID")
+github_app_private_key = os.environ.get("GITHUB_APP_PRIVATE_KEY")
+github_app_installation_id = os.environ.get("GITHUB_APP_INSTALLATION_ID")
 freshdesk_key = os.environ.get("FRESHDESK_KEY")
 freshdesk_url = os.environ.get("FRESHDESK_URL")
 org = os.environ.get("ORG")
 language = os.environ.get("LANGUAGE")
-project_number = os.environ.get("PROJECT")
-status_field = os.environ.get("STATUS_FIELD")
-priority_field = os.environ.get("PRIORITY_FIELD")
-company_field = os.environ.get("COMPANY_FIELD")
-iteration_field = os.environ.get("ITERATION_FIELD")
-type_label_map = os.environ.get("TYPE_LABELS")
-tag = os.environ.get("TAG")
+# Opzioni del target singolo, compilate in un SyncConfig da load_sync_targets
+target_options = {
+    "tag": os.environ.get("TAG"),
+    "project": os.environ.get("PROJECT"),
+    "status_field": os.environ.get("STATUS_FIELD"),
+    "priority_field": os.environ.get("PRIORITY_FIELD"),
+    "company_field": os.environ.get("COMPANY_FIELD"),
+    "iteration_field": os.environ.get("ITERATION_FIELD"),
+    "type_labels": os.environ.get("TYPE_LABELS"),
+}
+sync_targets_option = os.environ.get("SYNC_TARGETS")
+sync_lease_ttl = int(os.environ.get("SYNC_LEASE_TTL") or 900)
+sync_run_budget = int(os.environ.get("SYNC_RUN_BUDGET") or 0) or None
+sync_deadline_margin = 60
+freshdesk_read_workers = 8
+github_page_size = 100
+freshdesk_search_page_size = 30
+freshdesk_search_max_pages = 10
+freshdesk_search_cap = freshdesk_search_page_size * freshdesk_search_max_pages
+freshdesk_search_epoch = dt.date(2010, 1, 1)
+github_page_workers = 8
+# Letture Freshdesk massime del passaggio Github→Freshdesk per run, e tolleranza
+# sugli orologi nel confronto con updatedAt delle card
+reverse_sync_max_reads = 500
+reverse_sync_clock_margin = 300
+# Limiti secondari Github sulla creazione di contenuti, rispettati dal backfill
+github_create_per_minute = 80
+github_create_per_hour = 500
+github_create_retry_wait = 60
+freshdesk_backfill_workers = 4
+backfill_report_every = 25
+# Slice di card di progetto caricate in parallelo, e punti GraphQL da lasciare alla sync
+github_slice_workers = 8
+# Sotto questo numero di item il progetto si legge di seguito, senza slice
+github_slice_min_items = 1000
+github_graphql_reserve = 1000
+
+# Connessioni HTTP condivise da tutti i target del run
+github_session = requests.Session()
+# Ogni risposta Github aggiorna il rate limit residuo della credenziale usata
+github_session.hooks["response"].append(github_credential_observe)
+github_credentials_load(
+    token=github_token,
+    tokens=github_tokens,
+    app_id=github_app_id,
+    private_key=github_app_private_key,
+    installation_id=github_app_installation_id,
+    org=org,
+)
+freshdesk_session = requests.Session()
+
+freshdesk_bulk_chunk_size = 100
+freshdesk_job_poll_interval = 2
+freshdesk_job_poll_timeout = 120
+
+# Id GraphQL già risolti durante il run
+github_repository_cache = {}
+github_user_id_cache = {}
+github_members_cache = []
+freshdesk_company_cache = {}
+
+# Aggiornamenti dei ticket Freshdesk in attesa di invio: (ticket_id, payload)
+freshdesk_ticket_update_queue = []
+
+# Avanzamento del run, salvato dopo ogni ticket e ogni repository completati
+checkpoint = {"repos": [], "tickets": {}, "pending_updates": []}
+checkpoint_enabled = True
+# Lease del run preso dal comando in corso, rinnovato anche senza checkpoint
+lease_held = False
+lease_lock = threading.Lock()
+
+# Ticket già sincronizzati in questo run dal passaggio Freshdesk→Github
+synced_ticket_ids = set()
+
+
+@dataclass(frozen=True, slots=True)
+class SyncConfig:
+    """
+    Compiled options of one sync target (tag, project and field mapping)
+
+    Built from the options by sync_config_from_options and completed with the
+    project and Freshdesk lookups by sync_config_compile; never modified afterwards.
+    """
+
+    tag: str
+    project: str
+    status_field: str
+    priority_field: str
+    company_field: str
+    iteration_field: str
+    # Tipo ticket Freshdesk → label Github
+    type_labels: Mapping[str, str]
+    # Nome campo progetto → valore da leggere dal fieldValue della card
+    card_fields: Mapping[str, str]
+    project_id: str = None
+    # Nome campo progetto → {"id": ..., "options": {nome opzione: id opzione}}
+    project_fields: Mapping[str, Mapping] = MappingProxyType({})
+    # Nome campo Freshdesk → {valore scelta: etichetta}
+    freshdesk_choices: Mapping[str, Mapping] = MappingProxyType({})
+
+
+def sync_config_from_options(options: dict):
+    for key in (
+        "tag",
+        "project",
+        "status_field",
+        "priority_field",
+        "company_field",
+        "iteration_field",
+    ):
+        if not options.get(key):
+            raise ValueError(f"opzione '{key}' mancante")
+    type_labels = options.get("type_labels") or []
+    if isinstance(type_labels, str):
+        type_labels = ast.literal_eval(type_labels)
+    if not all(isinstance(m, (list, tuple)) and len(m) == 2 for m in type_labels):
+        raise ValueError(f"type_labels non valido: {type_labels}")
+    return SyncConfig(
+        tag=options["tag"],
+        project=str(options["project"]),
+        status_field=options["status_field"],
+        priority_field=options["priority_field"],
+        company_field=options["company_field"],
+        iteration_field=options["iteration_field"],
+        type_labels=MappingProxyType({m[0]: m[1] for m in type_labels}),
+        card_fields=MappingProxyType(
+            {
+                options["status_field"]: "name",
+                options["company_field"]: "text",
+                options["priority_field"]: "name",
+                options["iteration_field"]: "startDate",
+            }
+        ),
+    )
+
+
+def sync_config_compile(config: SyncConfig, project: dict, freshdesk_choices: Mapping):
+    project_fields = {}
+    for f in project["fields"]:
+        if "name" in f:
+            project_fields[f["name"]] = MappingProxyType(
+                {
+                    "id": f["id"],
+                    "options": MappingProxyType(
+                        {o["name"]: o["id"] for o in f.get("options", [])}
+                    ),
+                }
+            )
+    for name in (config.status_field, config.priority_field, config.company_field):
+        if name not in project_fields:
+            log.warning(f"[yellow]Campo '{name}' non trovato nel progetto Github {config.project}.")
+    return dataclasses.replace(
+        config,
+        project_id=project["id"],
+        project_fields=MappingProxyType(project_fields),
+        freshdesk_choices=freshdesk_choices,
+    )
 
 
 # A simple function to use requests.post to make the API call. Note the json= section.
-def github_run_query(query):
-    request = requests.post(
+def github_run_query(query, variables=None):
+    payload = {"query": query}
+    if variables:
+        payload.update({"variables": variables})
+    request = github_session.post(
         "https://api.github.com/graphql",
-        json={"query": query},
+        json=payload,
         headers=github_graphql_header(),
     )
     if request.status_code == 200:
@@ -41,22 +237,27 @@ def github_run_query(query):
 
 def github_graphql_header():
     headers = {}
-    headers.update(github_auth())
+    headers.update(github_auth(resource="graphql"))
     headers.update({"X-Github-Next-Global-ID": "1"})
     return headers
 
 
-def github_auth():
-    auth = {"Authorization": "Bearer " + github_token}
+def github_auth(resource: str = "core"):
+    # Token della credenziale con più richieste residue per la risorsa
+    token = github_credential_token(resource)
+    if token is None:
+        return {}
+    auth = {"Authorization": "Bearer " + token}
     return auth
 
 
-def github_get_project_fields():
+def github_get_project_fields(config: SyncConfig):
     log.info("[yellow]Getting Github Project Fields")
     query = f"""
         {{
         organization(login: "{org}"){{
-            projectV2(number: {project_number}) {{
+            projectV2(number: {config.project}) {{
+            id
             fields(first: 20) {{
                 nodes{{
                 ...on ProjectV2SingleSelectField{{
@@ -79,155 +280,261 @@ def github_get_project_fields():
         }}
     """
     response = github_run_query(query)
-    fields = response["data"]["organization"]["projectV2"]["fields"]["nodes"]
-    return fields
+    project = response["data"]["organization"]["projectV2"]
+    return {"id": project["id"], "fields": project["fields"]["nodes"]}
 
 
-def github_get_project_statuses(fields: dict):
-    for f in fields:
-        if "name" in f:
-            if f["name"] == status_field:
-                options = []
-                for o in f["options"]:
-                    options.append(o["name"])
-                return options
+def github_get_project_statuses(config: SyncConfig):
+    return list(config.project_fields.get(config.status_field, {}).get("options", {}))
 
 
-def github_get_project_priorities(fields: dict):
-    for f in fields:
-        if "name" in f:
-            if f["name"] == priority_field:
-                options = []
-                for o in f["options"]:
-                    option = {}
-                    option.update({"name": o["name"]})
-                    option.update({"id": o["id"]})
-                    option.update({"field_id": f["id"]})
-                    options.append(option)
-                return options
+def github_get_priority_option_id(priority: str, config: SyncConfig):
+    field = config.project_fields.get(config.priority_field)
+    if field is None or priority not in field["options"]:
+        return None, None
+    return field["options"][priority], field["id"]
 
 
-def github_get_priority_option_id(priority: str, fields: dict):
-    priority_options = github_get_project_priorities(fields=fields)
-    option = next(opt for opt in priority_options if opt["name"] == priority)
-    if option != {}:
-        return option["id"], option["field_id"]
+def github_get_company_field_id(config: SyncConfig):
+    field = config.project_fields.get(config.company_field)
+    if field is not None:
+        return field["id"]
 
 
-def github_get_company_field_id(fields: dict):
-    for f in fields:
-        if "name" in f:
-            if f["name"] == company_field:
-                return f["id"]
+def github_get_create_ids(repo: str, assignees: list):
+    # Risolve in una sola query gli id di repository, label e assegnatari non ancora in cache
+    parts = []
+    if repo not in github_repository_cache:
+        parts.append(
+            f"""repository: repository(owner: "{org}", name: "{repo}") {{
+                id
+                labels(first: 100) {{ nodes {{ id name }} }}
+            }}"""
+        )
+    missing = [a for a in assignees if a not in github_user_id_cache]
+    for i, login in enumerate(missing):
+        parts.append(f'user{i}: user(login: "{login}") {{ id }}')
+    if parts:
+        response = github_run_query("{\n" + "\n".join(parts) + "\n}")
+        data = response.get("data") or {}
+        if data.get("repository"):
+            github_repository_cache[repo] = {
+                "id": data["repository"]["id"],
+                "labels": {
+                    l["name"]: l["id"] for l in data["repository"]["labels"]["nodes"]
+                },
+            }
+        for i, login in enumerate(missing):
+            if data.get(f"user{i}"):
+                github_user_id_cache[login] = data[f"user{i}"]["id"]
+    repository = github_repository_cache.get(repo)
+    assignee_ids = [github_user_id_cache[a] for a in assignees if a in github_user_id_cache]
+    return repository, assignee_ids
+
+
+def github_get_label_id(repo: str, name: str):
+    # Label oltre le prime 100 lette con il repository: cercata per nome e messa in cache
+    labels = github_repository_cache[repo]["labels"]
+    if name not in labels:
+        query = """
+            query($owner: String!, $repo: String!, $name: String!) {
+                repository(owner: $owner, name: $repo) { label(name: $name) { id } }
+            }
+        """
+        response = github_run_query(query, variables={"owner": org, "repo": repo, "name": name})
+        label = ((response.get("data") or {}).get("repository") or {}).get("label")
+        if label is None:
+            return None
+        labels[name] = label["id"]
+    return labels[name]
+
+
+def github_add_issue_labels(repo: str, issue_number, labels: list):
+    # Via REST le label mancanti vengono create, come quando l'issue era creata via REST
+    url = f"https://api.github.com/repos/{org}/{repo}/issues/{issue_number}/labels"
+    response = github_session.post(url=url, headers=github_auth(), json={"labels": labels})
+    if response.status_code != 200:
+        log.error(f"[red]Errore nell'aggiunta delle label {labels} all'Issue Github {issue_number}: {response.reason}")
+        log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
 
 
-def github_get_members():
-    url = f"https://api.github.com/orgs/{org}/members"
-    auth = github_auth()
-    response = requests.get(url=url, headers=auth)
+def github_get_page(url: str, params: dict, page: int):
+    response = github_session.get(
+        url=url, headers=github_auth(), params=dict(params, page=page)
+    )
     if response.status_code == 200:
-        members = []
-        for m in json.loads(response.content):
-            members.append(m["login"])
-        return members
+        return response
     else:
-        log.error(f"[red]Errore nel recupero dei membri Github: {response.reason}")
+        log.error(f"[red]Errore nel recupero della pagina {page} di {url}: {response.reason}")
         log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
+        return None # Restituisce None in caso di errore
+
+
+def github_get_all_pages(url: str, params: dict = None):
+    # La prima pagina indica (Link: last) quante pagine ci sono, le altre vengono lette in parallelo
+    params = dict(params or {}, per_page=github_page_size)
+    first = github_get_page(url, params, 1)
+    if first is None:
+        return None
+    items = json.loads(first.content)
+    last_url = first.links.get("last", {}).get("url")
+    if not last_url:
+        return items
+    last_page = int(parse_qs(urlparse(last_url).query)["page"][0])
+    pages = range(2, last_page + 1)
+    with ThreadPoolExecutor(max_workers=github_page_workers) as executor:
+        responses = list(
+            executor.map(lambda page: github_get_page(url, params, page), pages)
+        )
+    # Una pagina mancante renderebbe la lista incompleta senza che il chiamante lo sappia:
+    # si riprova una volta, poi si rinuncia all'intera lettura
+    for page, response in zip(pages, responses):
+        if response is None:
+            response = github_get_page(url, params, page)
+        if response is None:
+            log.error(f"[red]Pagina {page} di {url} non recuperata, lettura incompleta scartata.")
+            return None
+        items += json.loads(response.content)
+    return items
+
+
+def github_get_members():
+    if github_members_cache:
+        return github_members_cache
+    log.info("[yellow]Getting Github Members")
+    content = github_get_all_pages(f"https://api.github.com/orgs/{org}/members")
+    if content is None:
         return [] # Restituisce una lista vuota in caso di errore
+    members = []
+    for m in content:
+        members.append(m["login"])
+    github_members_cache.extend(members)
+    return members
 
 
 def github_get_repos():
     log.info("[yellow]Getting Github Repositories")
-    url = f"https://api.github.com/orgs/{org}/repos"
-    auth = github_auth()
+    content = github_get_all_pages(
+        f"https://api.github.com/orgs/{org}/repos", params={"type": "all"}
+    )
+    if content is None:
+        return [] # Restituisce una lista vuota in caso di errore
     repos = []
-    morepages = True
-    while morepages:
-        response = requests.get(url=url, headers=auth)
-        if response.status_code == 200:
-            content = json.loads(response.content)
-            for r in content:
-                if not r["archived"]:
-                    if language != "":
-                        if r["language"] == "AL":
-                            repos.append(r["name"])
-                    else:
-                        repos.append(r["name"])
-            try:
-                url = response.links["next"]["url"]
-            except:
-                morepages = False
-        else:
-            log.error(f"[red]Errore nel recupero dei repository Github: {response.reason}")
-            log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
-            morepages = False # Ferma il loop in caso di errore
+    for r in content:
+        if not r["archived"]:
+            if language:
+                if r["language"] == language:
+                    repos.append(r["name"])
+            else:
+                repos.append(r["name"])
     return repos
 
 
-def github_get_project_cards(after_cursor=""):
-    log.info("[yellow]Getting Github Project Items")
-    query = f"""
-        {{
-            organization(login: "{org}") {{
-                projectV2(number: {project_number}) {{
-                id
-                items(first: 100, after: "{after_cursor}") {{
-                    edges {{
-                    node {{
+# Campi di un item di progetto, condivisi dalle query che leggono le card
+github_project_item_fields = """
                         id
-                        content {{
-                        ... on Issue {{
+                        updatedAt
+                        content {
+                        ... on Issue {
                             id
                             number
                             title
-                            repository {{
+                            assignees(first: 1) {
+                            nodes {
+                                login
+                            }
+                            }
+                            repository {
                             id
                             name
-                            }}
-                        }}
-                        }}
-                        fieldValues(first: 10, orderBy: {{field: POSITION, direction: ASC}}) {{
-                        nodes {{
-                            ... on ProjectV2ItemFieldTextValue {{
+                            }
+                        }
+                        }
+                        fieldValues(first: 10, orderBy: {field: POSITION, direction: ASC}) {
+                        nodes {
+                            ... on ProjectV2ItemFieldTextValue {
                             text
-                            field {{
-                                ... on ProjectV2Field {{
+                            field {
+                                ... on ProjectV2Field {
                                 id
                                 name
-                                }}
-                            }}
-                            }}
-                            ... on ProjectV2ItemFieldDateValue {{
+                                }
+                            }
+                            }
+                            ... on ProjectV2ItemFieldDateValue {
                             date
-                            field {{
-                                ... on ProjectV2Field {{
+                            field {
+                                ... on ProjectV2Field {
                                 id
                                 name
-                                }}
-                            }}
-                            }}
-                            ... on ProjectV2ItemFieldSingleSelectValue {{
+                                }
+                            }
+                            }
+                            ... on ProjectV2ItemFieldSingleSelectValue {
                             name
-                            field {{
-                                ... on ProjectV2SingleSelectField {{
+                            field {
+                                ... on ProjectV2SingleSelectField {
                                 id
                                 name
-                                }}
-                            }}
-                            }}
-                            ... on ProjectV2ItemFieldIterationValue {{
+                                }
+                            }
+                            }
+                            ... on ProjectV2ItemFieldIterationValue {
                             title
                             startDate
                             duration
-                            field {{
-                                ... on ProjectV2IterationField {{
+                            field {
+                                ... on ProjectV2IterationField {
                                 id
                                 name
-                                }}
-                            }}
-                            }}
-                        }}
-                        }}
+                                }
+                            }
+                            }
+                        }
+                        }
+"""
+
+
+def github_parse_project_item(node: dict, project_id: str, config: SyncConfig):
+    if not node["content"]:
+        return None
+    card_object = {}
+    card_object["project_id"] = project_id
+    card_object["item_id"] = node["id"]
+    card_object["updated_at"] = node["updatedAt"]
+    card_object["title"] = node["content"]["title"]
+    card_object["repository"] = node["content"]["repository"]["name"]
+    card_object["issue_number"] = node["content"]["number"]
+    card_object["issue_id"] = node["content"]["id"]
+    if node["content"]["assignees"]["nodes"]:
+        card_object["assignee"] = node["content"]["assignees"]["nodes"][0]["login"]
+    for f in node["fieldValues"]["nodes"]:
+        if f.get("field"):
+            name = f["field"]["name"]
+            value_key = config.card_fields.get(name)
+            if value_key is None:
+                continue
+            card_object[name] = f[value_key]
+            if name == config.iteration_field:
+                iterationend = dt.datetime.strptime(
+                    f["startDate"], "%Y-%m-%d"
+                ) + dt.timedelta(days=f["duration"])
+                card_object["iteration_end"] = iterationend.strftime("%Y-%m-%d")
+    return card_object
+
+
+def github_get_project_cards_page(config: SyncConfig, item_query: str, after_cursor: str):
+    # Una pagina di card: (card, cursore della pagina seguente o None, item totali)
+    query = f"""
+        {{
+            organization(login: "{org}") {{
+                projectV2(number: {config.project}) {{
+                id
+                items(first: 100, after: "{after_cursor}", query: "{item_query}") {{
+                    totalCount
+                    edges {{
+                    node {{
+                        {github_project_item_fields}
                     }}
                     }}
                     pageInfo {{
@@ -241,60 +548,118 @@ def github_get_project_cards(after_cursor=""):
         }}
     """
     response = github_run_query(query)
+    project = response["data"]["organization"]["projectV2"]
     cards = []
-    for card in response["data"]["organization"]["projectV2"]["items"]["edges"]:
-        if card["node"]["content"]:
-            card_object = {}
-            card_object["project_id"] = response["data"]["organization"]["projectV2"][
-                "id"
-            ]
-            card_object["item_id"] = card["node"]["id"]
-            card_object["title"] = card["node"]["content"]["title"]
-            card_object["repository"] = card["node"]["content"]["repository"]["name"]
-            card_object["issue_number"] = card["node"]["content"]["number"]
-            card_object["issue_id"] = card["node"]["content"]["id"]
-            for f in card["node"]["fieldValues"]["nodes"]:
-                if f.get("field"):
-                    if f["field"]["name"] == status_field:
-                        card_object[status_field] = f["name"]
-                    if f["field"]["name"] == company_field:
-                        card_object[company_field] = f["text"]
-                    if f["field"]["name"] == priority_field:
-                        card_object[priority_field] = f["name"]
-                    if f["field"]["name"] == iteration_field:
-                        card_object[iteration_field] = f["startDate"]
-                        iterationend = dt.datetime.strptime(
-                            f["startDate"], "%Y-%m-%d"
-                        ) + dt.timedelta(days=f["duration"])
-                        card_object["iteration_end"] = iterationend.strftime("%Y-%m-%d")
+    for card in project["items"]["edges"]:
+        card_object = github_parse_project_item(card["node"], project["id"], config)
+        if card_object:
             cards.append(card_object)
-    if response["data"]["organization"]["projectV2"]["items"]["pageInfo"][
-        "hasNextPage"
-    ]:
-        cards = cards + github_get_project_cards(
-            after_cursor=response["data"]["organization"]["projectV2"]["items"][
-                "pageInfo"
-            ]["endCursor"]
+    total_count = project["items"]["totalCount"]
+    if project["items"]["pageInfo"]["hasNextPage"]:
+        return cards, project["items"]["pageInfo"]["endCursor"], total_count
+    return cards, None, total_count
+
+
+def github_get_project_cards(config: SyncConfig, item_query="", after_cursor=""):
+    # Restituisce (card, completo): sotto la riserva GraphQL le pagine restanti vengono saltate
+    log.info("[yellow]Getting Github Project Items " + item_query)
+    cards = []
+    while True:
+        if github_credentials_remaining("graphql") < github_graphql_reserve:
+            log.warning(
+                f"[yellow]Budget GraphQL quasi esaurito: card del progetto {config.project} '{item_query}' caricate solo in parte."
+            )
+            return cards, False
+        page, after_cursor, _ = github_get_project_cards_page(config, item_query, after_cursor)
+        cards += page
+        if after_cursor is None:
+            return cards, True
+
+
+def github_get_project_cards_sliced(config: SyncConfig, item_queries: list):
+    # Le slice (un filtro items ciascuna) sono paginate in parallelo,
+    # le card vengono unite per id dell'item.
+    # Restituisce (card, filtri delle slice caricate solo in parte)
+    with ThreadPoolExecutor(max_workers=github_slice_workers) as executor:
+        slices = executor.map(
+            lambda item_query: github_get_project_cards(config, item_query=item_query),
+            item_queries,
         )
-    return cards
+        cards = {}
+        incomplete = []
+        for item_query, (slice_cards, complete) in zip(item_queries, slices):
+            if not complete:
+                incomplete.append(item_query)
+            for card in slice_cards:
+                cards.setdefault(card["item_id"], card)
+    return list(cards.values()), incomplete
+
+
+def github_get_project_item(item_id: str):
+    # Un solo item di progetto per id: (numero progetto, id progetto, nodo)
+    query = f"""
+        {{
+            node(id: "{item_id}") {{
+                ... on ProjectV2Item {{
+                    {github_project_item_fields}
+                    project {{
+                        id
+                        number
+                    }}
+                }}
+            }}
+        }}
+    """
+    response = github_run_query(query)
+    node = (response.get("data") or {}).get("node")
+    if not node:
+        log.error(f"[red]Item di progetto Github {item_id} non trovato.")
+        return None
+    return str(node["project"]["number"]), node["project"]["id"], node
 
 
-def map_type_label(type: str):
-    maplist = ast.literal_eval(type_label_map)
-    for map in maplist:
-        if type == map[0]:
-            return map[1]
-    return None
+def github_get_issue_project_items(repo: str, issue_number):
+    # Gli item di progetto di una sola issue: [(numero progetto, id progetto, nodo)]
+    query = f"""
+        {{
+            repository(owner: "{org}", name: "{repo}") {{
+                issue(number: {issue_number}) {{
+                    projectItems(first: 20) {{
+                        nodes {{
+                            {github_project_item_fields}
+                            project {{
+                                id
+                                number
+                            }}
+                        }}
+                    }}
+                }}
+            }}
+        }}
+    """
+    response = github_run_query(query)
+    repository = (response.get("data") or {}).get("repository") or {}
+    if not repository.get("issue"):
+        log.error(f"[red]Issue Github {repo}#{issue_number} non trovata.")
+        return []
+    return [
+        (str(n["project"]["number"]), n["project"]["id"], n)
+        for n in repository["issue"]["projectItems"]["nodes"]
+    ]
 
 
-def github_build_issue(ticket: dict):
+def map_type_label(type: str, config: SyncConfig):
+    return config.type_labels.get(type)
+
+
+def github_build_issue(ticket: dict, config: SyncConfig):
     issue = {}
     assignees = None
     title = (
         f"{ticket["custom_fields"]["cf_development_task_title"]} (FD#{ticket["id"]})"
     )
     body = f"{ticket["summary"]}\n\n<a href=https://{freshdesk_url}/a/tickets/{str(ticket['id'])}>Freshdeck Ticket #{str(ticket['id'])}</a>"
-    label = [map_type_label(ticket["type"])]
+    label = [map_type_label(ticket["type"], config)]
     if ticket["custom_fields"]["cf_assigned_developer"] != None:
         assignees = [ticket["custom_fields"]["cf_assigned_developer"]]
     issue.update({"title": title})
@@ -306,22 +671,6 @@ def github_build_issue(ticket: dict):
     return issue
 
 
-def github_create_issue(ticket: dict, repo: str):
-    issue = github_build_issue(ticket)
-    if issue != {}:
-        log.info("[yellow]Creating Github Issue " + str(issue))
-        url = f"https://api.github.com/repos/{org}/{repo}/issues"
-        auth = github_auth()
-        response = requests.post(url=url, headers=auth, json=issue)
-        if response.status_code == 201:
-            gh_issue = json.loads(response.content)
-            return gh_issue
-        else:
-            log.error(f"[red]Errore nella creazione dell'Issue Github: {response.reason}")
-            log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
-            return {} # Restituisce un dizionario vuoto in caso di errore
-
-
 def github_compare_issue_field(
     gh_issue: dict, field: str, value: str, updated_issue: dict
 ):
@@ -346,7 +695,7 @@ def github_compare_issue_field(
                 updated_issue.update({field: [value]})
 
 
-def github_update_issue(ticket: dict, gh_issue: dict, repo: str, card: dict):
+def github_update_issue(ticket: dict, gh_issue: dict, repo: str, card: dict, config: SyncConfig):
     fd_assignee = ticket["custom_fields"]["cf_assigned_developer"]
     try:
         gh_assignee = gh_issue["assignee"]["login"]
@@ -359,7 +708,7 @@ def github_update_issue(ticket: dict, gh_issue: dict, repo: str, card: dict):
         f"{ticket["custom_fields"]["cf_development_task_title"]} (FD#{ticket["id"]})"
     )
     body = f"<a href=https://{freshdesk_url}/a/tickets/{str(ticket['id'])}>Freshdeck Ticket #{str(ticket['id'])}</a>"
-    label = map_type_label(ticket["type"])
+    label = map_type_label(ticket["type"], config)
     updated_issue = {}
     github_compare_issue_field(
         gh_issue=gh_issue, field="title", value=title, updated_issue=updated_issue
@@ -380,13 +729,15 @@ def github_update_issue(ticket: dict, gh_issue: dict, repo: str, card: dict):
         )
         url = f"https://api.github.com/repos/{org}/{repo}/issues/{gh_issue['number']}"
         auth = github_auth()
-        response = requests.patch(url=url, headers=auth, json=updated_issue)
+        response = github_session.patch(url=url, headers=auth, json=updated_issue)
         if response.status_code == 200:
             gh_issue = json.loads(response.content)
+            freshness_written(ticket["id"], freshdesk_to_github, ticket["updated_at"])
             return card
         else:
             log.error(f"[red]Errore nell'aggiornamento dell'Issue Github: {response.reason}")
             log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
+            freshness_out_of_sync(ticket["id"], freshdesk_to_github, ticket["updated_at"])
             return card # Restituisce la card originale in caso di errore
     else:
         return card
@@ -396,7 +747,7 @@ def github_get_issue(gh_issue_number: str, repo: str):
     log.info("[yellow]Getting Github Issue " + str(gh_issue_number))
     url = f"https://api.github.com/repos/{org}/{repo}/issues/{gh_issue_number}"
     auth = github_auth()
-    response = requests.get(url=url, headers=auth)
+    response = github_session.get(url=url, headers=auth)
     if response.status_code == 200:
         gh_issue = json.loads(response.content)
         return gh_issue
@@ -406,61 +757,263 @@ def github_get_issue(gh_issue_number: str, repo: str):
         return None # Restituisce None in caso di errore
 
 
-def github_update_project_card(card: dict, company: str, priority: str, fields: dict):
+def github_find_ticket_issue(repo: str, ticket_id, since: str = None):
+    # Cerca l'issue già creata per un ticket, dal suffisso (FD#id) del titolo, tra le issue
+    # del repository aggiornate da "since" (la ricerca è indicizzata in ritardo, la lista no).
+    # Restituisce None se l'issue non esiste, False se la lista non è stata letta
+    params = {"state": "all"}
+    if since:
+        params["since"] = since
+    issues = github_get_all_pages(f"https://api.github.com/repos/{org}/{repo}/issues", params=params)
+    if issues is None:
+        return False
+    for gh_issue in issues:
+        if "pull_request" not in gh_issue and gh_issue["title"].endswith(f"(FD#{ticket_id})"):
+            return {
+                "node_id": gh_issue["node_id"],
+                "number": gh_issue["number"],
+                "title": gh_issue["title"],
+                "html_url": gh_issue["html_url"],
+                "created_at": gh_issue["created_at"],
+                "repository_url": gh_issue["repository_url"],
+                "user": {"login": gh_issue["user"]["login"]},
+            }
+    return None
+
+
+def github_company_field_mutation(
+    alias: str, item_id: str, company: str, config: SyncConfig
+):
+    field_id = github_get_company_field_id(config)
+    if field_id is None:
+        return None
+    # Il nome della company arriva da Freshdesk: passa come variabile, non nel testo della mutation
+    return (
+        """
+                %s: updateProjectV2ItemFieldValue(
+                    input: {projectId: "%s", itemId: "%s", fieldId: "%s", value: {text: $%s_text } }
+                    ) {
+                    clientMutationId
+                    }
+        """
+        % (
+            alias,
+            config.project_id,
+            item_id,
+            field_id,
+            alias,
+        ),
+        {f"{alias}_text": ("String!", company)},
+    )
+
+
+def github_priority_field_mutation(
+    alias: str, item_id: str, priority: str, config: SyncConfig
+):
+    priority_option_id, field_id = github_get_priority_option_id(
+        priority=priority, config=config
+    )
+    if priority_option_id is None:
+        log.warning(f"[yellow]Priorità '{priority}' non trovata tra le opzioni del progetto Github.")
+        return None
+    return (
+        """
+                %s: updateProjectV2ItemFieldValue(
+                    input: {projectId: "%s", itemId: "%s", fieldId: "%s", value: {singleSelectOptionId: "%s" } }
+                    ) {
+                    clientMutationId
+                    }
+        """
+        % (
+            alias,
+            config.project_id,
+            item_id,
+            field_id,
+            priority_option_id,
+        ),
+        {},
+    )
+
+
+def github_run_mutations(mutations: list):
+    # Invia più mutation nello stesso documento GraphQL: un solo round trip.
+    # Ogni mutation è (testo, {variabile: (tipo, valore)})
+    mutations = [m for m in mutations if m]
+    if mutations:
+        variables = {}
+        for _, mutation_variables in mutations:
+            variables.update(mutation_variables)
+        declarations = ", ".join(f"${name}: {type}" for name, (type, _) in variables.items())
+        query = (
+            "mutation"
+            + (f"({declarations})" if declarations else "")
+            + " {"
+            + "".join(text for text, _ in mutations)
+            + "}"
+        )
+        return github_run_query(
+            query, variables={name: value for name, (_, value) in variables.items()}
+        )
+
+
+def github_update_project_card(card: dict, company: str, priority: str, config: SyncConfig):
+    mutations = []
     card_company = ""
     try:
-        card_company = card[company_field]
+        card_company = card[config.company_field]
     except:
         card_company = ""
     if company != card_company:
         log.info("[yellow]Updating Github Project Item " + str(card))
-        card_id = card["item_id"]
-        project_id = card["project_id"]
-        field_id = github_get_company_field_id(fields=fields)
         # update company field
-        query = """
-            mutation {
-                updateProjectV2ItemFieldValue(
-                    input: {projectId: "%s", itemId: "%s", fieldId: "%s", value: {text: "%s" } }
-                    ) {
-                    clientMutationId
-                    }
-                }
-        """ % (
-            project_id,
-            card_id,
-            field_id,
-            company,
+        mutations.append(
+            github_company_field_mutation(
+                alias="company",
+                item_id=card["item_id"],
+                company=company,
+                config=config,
+            )
         )
-        response = github_run_query(query)
     card_priority = ""
     try:
-        card_priority = card[priority_field]
+        card_priority = card[config.priority_field]
     except:
         card_priority = ""
     if priority != card_priority:
         log.info("[yellow]Updating Github Project Item " + str(card))
-        card_id = card["item_id"]
-        project_id = card["project_id"]
-        priority_option_id, field_id = github_get_priority_option_id(
-            priority=priority, fields=fields
-        )
         # update priority field
-        query = """
-            mutation {
-                updateProjectV2ItemFieldValue(
-                    input: {projectId: "%s", itemId: "%s", fieldId: "%s", value: {singleSelectOptionId: "%s" } }
-                    ) {
-                    clientMutationId
+        mutations.append(
+            github_priority_field_mutation(
+                alias="priority",
+                item_id=card["item_id"],
+                priority=priority,
+                config=config,
+            )
+        )
+    return github_run_mutations(mutations)
+
+
+def github_create_issue_with_card(
+    ticket: dict, repo: str, cards: list, company: str, priority: str, config: SyncConfig
+):
+    # Crea l'issue già collegata al progetto e imposta subito company e priorità
+    issue = github_build_issue(ticket, config)
+    if issue == {}:
+        return {}
+    project_id = config.project_id
+    repository, assignee_ids = github_get_create_ids(
+        repo=repo, assignees=issue.get("assignees", [])
+    )
+    if repository is None:
+        log.error(f"[red]Repository Github '{repo}' non trovato, impossibile creare l'Issue.")
+        return {}
+    label_ids = []
+    missing_labels = []
+    for l in issue.get("labels", []):
+        label_id = github_get_label_id(repo, l)
+        if label_id is None:
+            missing_labels.append(l)
+        else:
+            label_ids.append(label_id)
+    log.info("[yellow]Creating Github Issue " + str(issue))
+    query = """
+        mutation($input: CreateIssueInput!) {
+            createIssue(input: $input) {
+                issue {
+                    id
+                    number
+                    title
+                    url
+                    createdAt
+                    author { login }
+                    repository { url }
+                    projectItems(first: 10) {
+                        nodes { id project { id } }
                     }
+                }
             }
-        """ % (
-            project_id,
-            card_id,
-            field_id,
-            priority_option_id,
+        }
+    """
+    variables = {
+        "input": {
+            "repositoryId": repository["id"],
+            "title": issue["title"],
+            "body": issue["body"],
+            "assigneeIds": assignee_ids,
+            "labelIds": label_ids,
+            "projectV2Ids": [project_id],
+        }
+    }
+    response = github_run_query(query, variables=variables)
+    if response.get("errors") or not (response.get("data") or {}).get("createIssue"):
+        log.error(f"[red]Errore nella creazione dell'Issue Github: {response.get('errors')}")
+        return {} # Restituisce un dizionario vuoto in caso di errore
+    created = response["data"]["createIssue"]["issue"]
+    gh_issue = {
+        "node_id": created["id"],
+        "number": created["number"],
+        "title": created["title"],
+        "html_url": created["url"],
+        "created_at": created["createdAt"],
+        "repository_url": created["repository"]["url"],
+        "user": created["author"],
+    }
+    if missing_labels:
+        log.warning(
+            f"[yellow]Label {missing_labels} non trovate in {repo}: aggiunte all'Issue Github {created['number']} via REST."
+        )
+        github_add_issue_labels(repo, created["number"], missing_labels)
+    item_id = next(
+        (i["id"] for i in created["projectItems"]["nodes"] if i["project"]["id"] == project_id),
+        None,
+    )
+    if item_id is None:
+        log.warning(f"[yellow]Issue Github {created['number']} creata ma non aggiunta al progetto.")
+        freshness_out_of_sync(ticket["id"], freshdesk_to_github, ticket["updated_at"])
+        return gh_issue
+    mutations = []
+    if company:
+        mutations.append(
+            github_company_field_mutation(
+                alias="company",
+                item_id=item_id,
+                company=company,
+                config=config,
+            )
+        )
+    if priority:
+        mutations.append(
+            github_priority_field_mutation(
+                alias="priority",
+                item_id=item_id,
+                priority=priority,
+                config=config,
+            )
         )
-        response = github_run_query(query)
+    response = github_run_mutations(mutations)
+    card = {
+        "project_id": project_id,
+        "item_id": item_id,
+        "title": created["title"],
+        "repository": repo,
+        "issue_number": created["number"],
+        "issue_id": created["id"],
+    }
+    if response is not None and response.get("errors"):
+        # Issue creata ma campi del progetto non impostati: la card resta senza
+        # company e priorità e la coppia va riallineata al prossimo run
+        log.error(
+            f"[red]Errore nell'impostazione dei campi del progetto per l'Issue Github {created['number']}: {response.get('errors')}"
+        )
+        freshness_out_of_sync(ticket["id"], freshdesk_to_github, ticket["updated_at"])
+    else:
+        if company:
+            card[config.company_field] = company
+        if priority:
+            card[config.priority_field] = priority
+        freshness_written(ticket["id"], freshdesk_to_github, ticket["updated_at"])
+    cards.append(card)
+    return gh_issue
 
 
 def freshdesk_headers():
@@ -473,7 +1026,7 @@ def freshdesk_get_fields():
     log.info("[yellow]Getting Freshdesk Fields")
     url = f"https://{freshdesk_url}/api/v2/admin/ticket_fields"
     headers, auth = freshdesk_headers()
-    response = requests.get(url=url, headers=headers, auth=auth)
+    response = freshdesk_session.get(url=url, headers=headers, auth=auth)
     if response.status_code == 200:
         return json.loads(response.content)
     else:
@@ -491,11 +1044,15 @@ def freshdesk_get_field_id(field_name: str, fields: list):
 
 def freshdesk_get_company_name(ticket: dict):
     if ticket["company_id"]:
+        if ticket["company_id"] in freshdesk_company_cache:
+            return freshdesk_company_cache[ticket["company_id"]]
         url = f"https://{freshdesk_url}//api/v2/companies/{ticket["company_id"]}"
         headers, auth = freshdesk_headers()
-        response = requests.get(url=url, headers=headers, auth=auth)
+        response = freshdesk_session.get(url=url, headers=headers, auth=auth)
         if response.status_code == 200:
-            return json.loads(response.content)["name"]
+            name = json.loads(response.content)["name"]
+            freshdesk_company_cache[ticket["company_id"]] = name
+            return name
         else:
             log.error(f"[red]Errore nel recupero del nome azienda Freshdesk: {response.reason}")
             log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
@@ -506,7 +1063,7 @@ def freshdesk_create_field(field: dict):
     log.info("[yellow]Creating Freshdesk Field " + str(field))
     url = f"https://{freshdesk_url}/api/v2/admin/ticket_fields"
     headers, auth = freshdesk_headers()
-    response = requests.post(url=url, headers=headers, json=field, auth=auth)
+    response = freshdesk_session.post(url=url, headers=headers, json=field, auth=auth)
     if response.status_code == 201:
         log.info(f"[green]Campo Freshdesk '{field.get('label', 'Sconosciuto')}' creato con successo.")
         return json.loads(response.content)
@@ -525,7 +1082,7 @@ def freshdesk_view_field(field_name: str, fields: list):
     
     url = f"https://{freshdesk_url}/api/v2/admin/ticket_fields/{field_id}"
     headers, auth = freshdesk_headers()
-    response = requests.get(url=url, headers=headers, auth=auth)
+    response = freshdesk_session.get(url=url, headers=headers, auth=auth)
     if response.status_code == 200:
         return json.loads(response.content)
     else:
@@ -542,67 +1099,11 @@ def freshdesk_get_field_choices(response: dict):
     return [] # Restituisce una lista vuota se le scelte non sono disponibili
 
 
-def freshdesk_field_choice_exists(field_choices: dict, choice: str):
-    # Assicurati che field_choices sia una lista prima di iterare
-    if not isinstance(field_choices, list):
-        return False
-    for c in field_choices:
-        if choice in c.get("value", ""): # Usare .get per sicurezza
-            return True
-    return False
-
-
-def freshdesk_add_field_choice(field: dict, field_choices: list, new_value: str):
-    # Questa logica sembra creare una nuova lista con solo la nuova scelta,
-    # invece di aggiungere alla lista esistente. Potrebbe essere un bug logico.
-    # Se l'intento è aggiungere, la logica dovrebbe essere:
-    # field_choices.append(new_choice)
-    # updated_field.update({"choices": field_choices})
-    # Per ora, mantengo la logica originale ma segnalo la potenziale anomalia.
-
-    if not field_choices:
-        field_choices = []
-    max_position = 0
-    for c in field_choices:
-        if c.get("position", 0) > max_position: # Usare .get per sicurezza
-            max_position = c["position"]
-    new_choice = {}
-    new_choice.update({"label": new_value})
-    new_choice.update({"value": new_value})
-    new_choice.update({"position": max_position + 1})
-    
-    # ATTENZIONE: Questo sovrascrive field_choices con una nuova lista contenente solo new_choice.
-    # Se l'intento è AGGIUNGERE la scelta alla lista esistente, la riga sotto è errata.
-    # Dovrebbe essere field_choices.append(new_choice) e poi passare la lista aggiornata.
-    # Ho commentato la riga originale e aggiunto quella corretta per chiarezza.
-    # field_choices = [] # Rimuovi o commenta questa riga se vuoi aggiungere alla lista esistente
-    # field_choices.append(new_choice) # Questa riga dovrebbe essere usata per aggiungere
-
-    # Per mantenere la logica che sembra essere stata tentata, ma con un fix:
-    # Creiamo una nuova lista che include le scelte originali e la nuova.
-    # Se field_choices è None o vuoto all'inizio di questa funzione,
-    # la logica sopra calcola max_position su una lista vuota, il che è corretto.
-    # Poi aggiungiamo la nuova scelta alla lista.
-    
-    # Assicuriamoci che field_choices sia una lista valida per l'append.
-    if not isinstance(field_choices, list):
-        field_choices = []
-    
-    # Crea una copia per evitare modifiche in-place indesiderate se field_choices è passato per riferimento
-    updated_choices_list = list(field_choices)
-    updated_choices_list.append(new_choice)
-
-    updated_field = {}
-    updated_field.update({"label": field["label"]})
-    updated_field.update({"choices": updated_choices_list}) # Usa la lista aggiornata
-    return updated_field
-
-
 def freshdesk_update_field(field_id: int, field: dict):
     log.info("[yellow]Updating Freshdesk Field " + str(field))
     url = f"https://{freshdesk_url}/api/v2/admin/ticket_fields/{field_id}"
     headers, auth = freshdesk_headers()
-    response = requests.put(url=url, headers=headers, json=field, auth=auth)
+    response = freshdesk_session.put(url=url, headers=headers, json=field, auth=auth)
     if response.status_code == 200:
         log.info(f"[green]Campo Freshdesk '{field.get('label', 'Sconosciuto')}' aggiornato con successo.")
         return json.loads(response.content)
@@ -613,48 +1114,122 @@ def freshdesk_update_field(field_id: int, field: dict):
         return None # Importante: restituisce None in caso di errore
 
 
-def freshdesk_resolve_priority(priority: str, fields: dict):
-    # Aggiunto controllo per None su freshdesk_view_field
-    field_response = freshdesk_view_field(field_name="priority", fields=fields)
-    if field_response is None:
-        log.error("[red]Impossibile risolvere la priorità: campo 'priority' non trovato o errore nel recupero.")
-        return priority # Restituisce la priorità originale o un valore di default
-    
-    field_choices = freshdesk_get_field_choices(response=field_response)
-    # Aggiunto controllo per gestire il caso in cui 'next' non trovi corrispondenze
-    try:
-        return next(ch for ch in field_choices if ch["value"] == priority)["label"]
-    except StopIteration:
-        log.warning(f"[yellow]Priorità '{priority}' non trovata tra le scelte del campo Freshdesk.")
-        return priority # Restituisce la priorità originale se non trovata
+def freshdesk_get_choices(fields: list):
+    # Scelte dei campi Freshdesk usati durante il sync, lette una sola volta per run
+    choices = {}
+    for field_name in ("priority",):
+        field_response = freshdesk_view_field(field_name=field_name, fields=fields)
+        if field_response is None:
+            log.error(f"[red]Impossibile leggere le scelte del campo '{field_name}'.")
+            continue
+        choices[field_name] = MappingProxyType(
+            {
+                ch["value"]: ch["label"]
+                for ch in freshdesk_get_field_choices(response=field_response)
+            }
+        )
+    return MappingProxyType(choices)
 
 
-def freshdesk_get_tickets(repo: str):
-    log.info("[yellow]Getting Freshdesk Tickets")
-    url = (
-        "https://"
-        + freshdesk_url
-        + '/api/v2/search/tickets?query="(status:<3 OR status:>6) AND tag:'
-        + "'"
-        + tag
-        + "'"
-        + " AND cf_repository:"
-        + "'"
-        + repo
-        + "'"
-        + '"'
-    )
+def freshdesk_resolve_priority(priority: str, config: SyncConfig):
+    labels = config.freshdesk_choices.get("priority", {})
+    if priority in labels:
+        return labels[priority]
+    log.warning(f"[yellow]Priorità '{priority}' non trovata tra le scelte del campo Freshdesk.")
+    return priority # Restituisce la priorità originale se non trovata
+
+
+def freshdesk_search_page(query: str, page: int):
+    url = f"https://{freshdesk_url}/api/v2/search/tickets"
     headers, auth = freshdesk_headers()
-    response = requests.get(url=url, headers=headers, auth=auth)
+    response = freshdesk_session.get(
+        url=url, headers=headers, auth=auth, params={"query": f'"{query}"', "page": page}
+    )
     if response.status_code == 200:
-        tickets = json.loads(response.content)["results"]
-        log.info("[green]Freshdesk Tickets found: " + str(len(tickets)))
-        return tickets
+        return json.loads(response.content)
     else:
         log.error(f"[red]Errore nel recupero dei ticket Freshdesk: {response.reason}")
         log.error(f"[red]Codice di stato: {response.status_code}")
         log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
-        return [] # Restituisce una lista vuota in caso di errore
+        return None # Restituisce None in caso di errore
+
+
+def freshdesk_window_query(query: str, window):
+    if window is None:
+        return query
+    start, end = window
+    return f"{query} AND created_at:>'{start.isoformat()}' AND created_at:<'{end.isoformat()}'"
+
+
+def freshdesk_split_window(window):
+    # Divide la finestra created_at (estremi inclusi) in due metà
+    if window is None:
+        window = (freshdesk_search_epoch, dt.date.today() + dt.timedelta(days=1))
+    start, end = window
+    middle = start + (end - start) // 2
+    return [(start, middle), (middle + dt.timedelta(days=1), end)]
+
+
+def freshdesk_search_tickets(query: str):
+    # Legge tutte le pagine della ricerca; se i risultati superano il limite di
+    # Freshdesk la query viene divisa in finestre di created_at sempre più piccole
+    tickets = {}
+    windows = [None]
+    with ThreadPoolExecutor(max_workers=freshdesk_read_workers) as executor:
+        while windows:
+            queries = [freshdesk_window_query(query, w) for w in windows]
+            first_pages = list(executor.map(lambda q: freshdesk_search_page(q, 1), queries))
+            next_windows = []
+            page_requests = []
+            for window, window_query, first in zip(windows, queries, first_pages):
+                if first is None:
+                    continue
+                total = first["total"]
+                if total > freshdesk_search_cap:
+                    if window is None or window[1] > window[0]:
+                        next_windows += freshdesk_split_window(window)
+                        continue
+                    log.warning(
+                        f"[yellow]{total} ticket Freshdesk creati il {window[0]}: solo i primi {freshdesk_search_cap} vengono letti."
+                    )
+                for t in first["results"]:
+                    tickets[t["id"]] = t
+                pages = min(math.ceil(total / freshdesk_search_page_size), freshdesk_search_max_pages)
+                page_requests += [(window_query, page) for page in range(2, pages + 1)]
+            for result in executor.map(lambda r: freshdesk_search_page(*r), page_requests):
+                if result is not None:
+                    for t in result["results"]:
+                        tickets[t["id"]] = t
+            windows = next_windows
+    return list(tickets.values())
+
+
+def freshdesk_get_tickets(repo: str, config: SyncConfig):
+    log.info("[yellow]Getting Freshdesk Tickets")
+    query = f"(status:<3 OR status:>6) AND tag:'{config.tag}' AND cf_repository:'{repo}'"
+    tickets = freshdesk_search_tickets(query)
+    log.info("[green]Freshdesk Tickets found: " + str(len(tickets)))
+    return tickets
+
+
+def freshdesk_get_ticket(ticket_id):
+    url = f"https://{freshdesk_url}/api/v2/tickets/{ticket_id}"
+    headers, auth = freshdesk_headers()
+    response = freshdesk_session.get(url=url, headers=headers, auth=auth)
+    if response.status_code == 200:
+        return json.loads(response.content)
+    else:
+        log.error(f"[red]Errore nel recupero del ticket Freshdesk {ticket_id}: {response.reason}")
+        log.error(f"[red]Codice di stato: {response.status_code}")
+        log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
+        return None # Restituisce None in caso di errore
+
+
+def freshdesk_get_tickets_by_id(ticket_ids: list):
+    # Letture indipendenti per id, eseguite in parallelo
+    with ThreadPoolExecutor(max_workers=freshdesk_read_workers) as executor:
+        tickets = executor.map(freshdesk_get_ticket, ticket_ids)
+    return {ticket_id: t for ticket_id, t in zip(ticket_ids, tickets) if t}
 
 
 def freshdesk_get_ticket_summary(ticket: dict):
@@ -663,7 +1238,7 @@ def freshdesk_get_ticket_summary(ticket: dict):
         "https://" + freshdesk_url + "/api/v2/tickets/" + str(ticket["id"]) + "/summary"
     )
     headers, auth = freshdesk_headers()
-    response = requests.get(url=url, headers=headers, auth=auth)
+    response = freshdesk_session.get(url=url, headers=headers, auth=auth)
     if response.status_code == 200:
         summary = json.loads(response.content)["body"]
         log.info("[green]Freshdesk Ticket Summary found")
@@ -690,7 +1265,7 @@ def freshdesk_update_ticket_ghissue(ticket: dict, gh_issue: dict):
         )
         url = f"https://{freshdesk_url}/api/v2/tickets/{ticket["id"]}"
         headers, auth = freshdesk_headers()
-        response = requests.put(
+        response = freshdesk_session.put(
             url=url, headers=headers, json=updated_ticket, auth=auth
         )
         if response.status_code == 200:
@@ -715,7 +1290,7 @@ def freshdesk_add_note(gh_issue: dict, ticket_id, repo: str):
     note.update({"private": True})
     url = f"https://{freshdesk_url}/api/v2/tickets/{ticket_id}/notes"
     headers, auth = freshdesk_headers()
-    response = requests.post(url=url, headers=headers, json=note, auth=auth)
+    response = freshdesk_session.post(url=url, headers=headers, json=note, auth=auth)
     if response.status_code == 201:
         log.info(f"[green]Nota aggiunta al ticket Freshdesk {ticket_id}.")
         return json.loads(response.content)
@@ -726,114 +1301,295 @@ def freshdesk_add_note(gh_issue: dict, ticket_id, repo: str):
         return None # Restituisce None in caso di errore
 
 
-def freshdesk_update_ticket_from_project(card: dict, ticket: dict):
-    updated_ticket = {}
+def freshdesk_update_ticket_from_project(card: dict, ticket: dict, config: SyncConfig):
+    custom_fields = {}
     try:
         new_ass = card["assignee"]
     except:
         new_ass = None
     if new_ass != ticket["custom_fields"]["cf_assigned_developer"]:
         if new_ass != None:
-            new_ass = {"cf_assigned_developer": new_ass}
-            updated_ticket.update({"custom_fields": new_ass})
-    if card[status_field] != ticket["custom_fields"]["cf_development_status"]:
-        new_status = {"cf_development_status": card[status_field]}
-        updated_ticket.update({"custom_fields": new_status})
+            custom_fields.update({"cf_assigned_developer": new_ass})
+    if config.status_field in card and card[config.status_field] != ticket["custom_fields"]["cf_development_status"]:
+        custom_fields.update({"cf_development_status": card[config.status_field]})
     try:
-        new_date = card[iteration_field]
+        new_date = card[config.iteration_field]
     except:
         new_date = None
     if new_date != ticket["custom_fields"]["cf_start_date"]:
-        new_date = {"cf_start_date": new_date}
-        updated_ticket.update({"custom_fields": new_date})
+        custom_fields.update({"cf_start_date": new_date})
     try:
         new_date = card["iteration_end"]
     except:
         new_date = None
     if new_date != ticket["custom_fields"]["cf_end_date"]:
-        new_date = {"cf_end_date": new_date}
-        updated_ticket.update({"custom_fields": new_date})
-    if updated_ticket != {}:
-        log.info(
-            "[yellow]Updating Freshdesk Ticket "
-            + str(ticket["id"])
-            + " "
-            + str(updated_ticket)
-        )
-        url = f"https://{freshdesk_url}/api/v2/tickets/{ticket["id"]}"
-        headers, auth = freshdesk_headers()
-        response = requests.put(
-            url=url, headers=headers, json=updated_ticket, auth=auth
-        )
-        if response.status_code == 200:
-            log.info(f"[green]Ticket Freshdesk {ticket['id']} aggiornato dal progetto.")
-            return json.loads(response.content)
-        else:
-            log.error(f"[red]Errore nell'aggiornamento del ticket Freshdesk {ticket['id']} dal progetto: {response.reason}")
-            log.error(f"[red]Codice di stato: {response.status_code}")
+        custom_fields.update({"cf_end_date": new_date})
+    if custom_fields != {}:
+        updated_ticket = {"custom_fields": custom_fields}
+        freshdesk_queue_ticket_update(ticket_id=ticket["id"], updated_ticket=updated_ticket)
+        freshness_pending(ticket["id"], github_to_freshdesk, card.get("updated_at"))
+        return updated_ticket
+    freshness_checked(ticket["id"], github_to_freshdesk)
+
+
+def freshdesk_put_ticket(ticket_id, updated_ticket: dict):
+    log.info(
+        "[yellow]Updating Freshdesk Ticket " + str(ticket_id) + " " + str(updated_ticket)
+    )
+    url = f"https://{freshdesk_url}/api/v2/tickets/{ticket_id}"
+    headers, auth = freshdesk_headers()
+    response = freshdesk_session.put(url=url, headers=headers, json=updated_ticket, auth=auth)
+    if response.status_code == 200:
+        log.info(f"[green]Ticket Freshdesk {ticket_id} aggiornato dal progetto.")
+        freshness_written(ticket_id, github_to_freshdesk)
+        return json.loads(response.content)
+    else:
+        log.error(f"[red]Errore nell'aggiornamento del ticket Freshdesk {ticket_id} dal progetto: {response.reason}")
+        log.error(f"[red]Codice di stato: {response.status_code}")
+        log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
+        freshness_out_of_sync(ticket_id, github_to_freshdesk)
+        return None # Restituisce None in caso di errore
+
+
+def freshdesk_queue_ticket_update(ticket_id, updated_ticket: dict):
+    log.info(
+        "[yellow]Queueing Freshdesk Ticket Update " + str(ticket_id) + " " + str(updated_ticket)
+    )
+    freshdesk_ticket_update_queue.append((ticket_id, updated_ticket))
+
+
+def freshdesk_get_job(job_id: str, deadline=None):
+    url = f"https://{freshdesk_url}/api/v2/jobs/{job_id}"
+    headers, auth = freshdesk_headers()
+    waited = 0
+    while True:
+        response = freshdesk_session.get(url=url, headers=headers, auth=auth)
+        if response.status_code != 200:
+            log.error(f"[red]Errore nel recupero del job Freshdesk {job_id}: {response.reason}")
             log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
             return None # Restituisce None in caso di errore
+        job = json.loads(response.content)
+        if job.get("status") not in ("QUEUED", "IN PROGRESS"):
+            return job
+        if waited >= freshdesk_job_poll_timeout:
+            log.warning(f"[yellow]Job Freshdesk {job_id} non completato entro {freshdesk_job_poll_timeout}s.")
+            return None
+        if deadline_reached(deadline, expected_seconds=freshdesk_job_poll_interval):
+            log.warning(f"[yellow]Job Freshdesk {job_id} non completato entro il budget del run.")
+            return None
+        time.sleep(freshdesk_job_poll_interval)
+        waited += freshdesk_job_poll_interval
+
+
+def freshdesk_bulk_update_tickets(ticket_ids: list, updated_ticket: dict, deadline=None):
+    # Restituisce gli id dei ticket non aggiornati dal job, da riprovare singolarmente
+    log.info(
+        "[yellow]Bulk Updating Freshdesk Tickets "
+        + str(ticket_ids)
+        + " "
+        + str(updated_ticket)
+    )
+    url = f"https://{freshdesk_url}/api/v2/tickets/bulk_update"
+    headers, auth = freshdesk_headers()
+    bulk_action = {"bulk_action": {"ids": ticket_ids, "properties": updated_ticket}}
+    response = freshdesk_session.post(url=url, headers=headers, json=bulk_action, auth=auth)
+    if response.status_code != 202:
+        log.error(f"[red]Errore nell'aggiornamento massivo dei ticket Freshdesk: {response.reason}")
+        log.error(f"[red]Codice di stato: {response.status_code}")
+        log.error(f"[red]Contenuto risposta: {response.content.decode('utf-8')}")
+        return ticket_ids
+    job = freshdesk_get_job(json.loads(response.content)["job_id"], deadline=deadline)
+    if job is None:
+        return ticket_ids
+    updated_ids = [d["id"] for d in job.get("data", []) if d.get("success")]
+    failed_ids = [i for i in ticket_ids if i not in updated_ids]
+    log.info(
+        f"[green]Aggiornamento massivo Freshdesk: {len(updated_ids)} ticket aggiornati, {len(failed_ids)} da riprovare."
+    )
+    return failed_ids
+
+
+def freshdesk_flush_ticket_updates(deadline=None):
+    # Restituisce i ticket non aggiornati: scritture fallite e aggiornamenti rimandati
+    if not freshdesk_ticket_update_queue:
+        return set()
+    # Per ogni ticket vale solo l'ultimo aggiornamento in coda (ad esempio quello di
+    # questo run rispetto a uno ripreso dal checkpoint), poi i ticket con payload
+    # identico vengono raggruppati: un solo bulk_update per gruppo
+    latest = {}
+    for ticket_id, updated_ticket in freshdesk_ticket_update_queue:
+        latest.pop(ticket_id, None)
+        latest[ticket_id] = updated_ticket
+    groups = {}
+    for ticket_id, updated_ticket in latest.items():
+        key = json.dumps(updated_ticket, sort_keys=True)
+        if key not in groups:
+            groups[key] = {"payload": updated_ticket, "ids": []}
+        groups[key]["ids"].append(ticket_id)
+    freshdesk_ticket_update_queue.clear()
+    # Oltre la scadenza del run gli aggiornamenti restano in coda, e nel checkpoint
+    deferred = []
+    failed = set()
+    for group in groups.values():
+        ticket_ids = group["ids"]
+        if deadline_reached(deadline):
+            deferred += [(ticket_id, group["payload"]) for ticket_id in ticket_ids]
+            continue
+        if len(ticket_ids) == 1:
+            if freshdesk_put_ticket(ticket_id=ticket_ids[0], updated_ticket=group["payload"]) is None:
+                failed.add(ticket_ids[0])
+            continue
+        for i in range(0, len(ticket_ids), freshdesk_bulk_chunk_size):
+            chunk = ticket_ids[i : i + freshdesk_bulk_chunk_size]
+            if deadline_reached(deadline):
+                deferred += [(ticket_id, group["payload"]) for ticket_id in chunk]
+                continue
+            failed_ids = freshdesk_bulk_update_tickets(
+                ticket_ids=chunk,
+                updated_ticket=group["payload"],
+                deadline=deadline,
+            )
+            for ticket_id in chunk:
+                if ticket_id not in failed_ids:
+                    freshness_written(ticket_id, github_to_freshdesk)
+            for ticket_id in failed_ids:
+                if deadline_reached(deadline):
+                    deferred.append((ticket_id, group["payload"]))
+                    continue
+                if freshdesk_put_ticket(ticket_id=ticket_id, updated_ticket=group["payload"]) is None:
+                    failed.add(ticket_id)
+    if deferred:
+        log.warning(f"[yellow]Run budget exhausted: {len(deferred)} Freshdesk updates deferred to the next run")
+        freshdesk_ticket_update_queue.extend(deferred)
+    return failed | {ticket_id for ticket_id, _ in deferred}
+
+
+def checkpoint_key(repo: str, config: SyncConfig):
+    return f"{config.tag}|{config.project}|{repo}"
+
+
+def checkpoint_start(resume: bool, enabled: bool = True):
+    # I run mirati non toccano il checkpoint del run completo
+    global checkpoint_enabled
+    checkpoint_enabled = enabled
+    if not enabled:
+        return
+    if resume:
+        saved = state_load("checkpoint")
+        if saved:
+            checkpoint.update(saved)
+            # Gli aggiornamenti Freshdesk non ancora inviati dal run interrotto
+            for ticket_id, updated_ticket in checkpoint["pending_updates"]:
+                freshdesk_ticket_update_queue.append((ticket_id, updated_ticket))
+            log.info(
+                f"[green]Resuming interrupted run: {len(checkpoint['repos'])} repositories already completed"
+            )
+            return
+    state_clear("checkpoint")
+
+
+def lease_keepalive():
+    if lease_held:
+        with lease_lock:
+            lease_renew(sync_lease_ttl)
+
+
+def checkpoint_save():
+    lease_keepalive()
+    if not checkpoint_enabled:
+        return
+    checkpoint["pending_updates"] = list(freshdesk_ticket_update_queue)
+    state_save("checkpoint", checkpoint)
+
+
+def checkpoint_repo_completed(repo: str, config: SyncConfig):
+    return checkpoint_key(repo, config) in checkpoint["repos"]
+
+
+def checkpoint_repo_done(repo: str, config: SyncConfig):
+    checkpoint["repos"].append(checkpoint_key(repo, config))
+    checkpoint["tickets"].pop(checkpoint_key(repo, config), None)
+    checkpoint_save()
+
+
+def checkpoint_ticket_completed(repo: str, ticket_id, config: SyncConfig):
+    return ticket_id in checkpoint["tickets"].get(checkpoint_key(repo, config), [])
+
+
+def checkpoint_ticket_done(repo: str, ticket_id, config: SyncConfig):
+    checkpoint["tickets"].setdefault(checkpoint_key(repo, config), []).append(ticket_id)
+    checkpoint_save()
+
+
+def checkpoint_finish():
+    if checkpoint_enabled:
+        state_clear("checkpoint")
+
+
+def load_sync_targets():
+    # Ogni target è una tupla (tag, progetto, mappatura campi); i valori mancanti
+    # vengono presi dalle opzioni singole. Le card del progetto si aggiungono dopo.
+    options_list = [target_options]
+    if sync_targets_option:
+        options_list = [dict(target_options, **t) for t in ast.literal_eval(sync_targets_option)]
+    targets = []
+    for options in options_list:
+        try:
+            config = sync_config_from_options(options)
+        except (ValueError, SyntaxError) as e:
+            log.error(f"[red]Configurazione del target non valida {options}: {e}")
+            exit(1)
+        targets.append({"config": config, "cards": []})
+    return targets
+
+
+def freshdesk_provision_static_fields(fields: list):
+    static_fields = [
+        ("cf_development_task_title", "Task Title", "custom_text", True),
+        ("cf_github_issue", "Github Issue", "custom_text", False),
+        ("cf_start_date", "Start Date", "custom_date", True),
+        ("cf_end_date", "End Date", "custom_date", True),
+    ]
+    for name, label, field_type, displayed_to_customers in static_fields:
+        if not next((field for field in fields if field["name"] == name), False):
+            log.info(f"[yellow]Campo '{label}' non trovato, tentativo di creazione.")
+            field = {
+                "label": label,
+                "label_for_customers": label,
+                "type": field_type,
+                "customers_can_edit": False,
+                "required_for_closure": False,
+                "required_for_agents": False,
+                "required_for_customers": False,
+                "displayed_to_customers": displayed_to_customers,
+            }
+            freshdesk_create_field(field=field)
+        else:
+            log.info(f"[green]Campo '{label}' già esistente.")
 
 
-def get_create_fields(repos: dict):
-    fields = freshdesk_get_fields()
-    github_project_fields = github_get_project_fields()
-
-    # Gestione del campo 'Task Title'
-    if not next(
-        (field for field in fields if field["name"] == "cf_development_task_title"),
-        False,
-    ):
-        log.info("[yellow]Campo 'Task Title' non trovato, tentativo di creazione.")
-        field = {
-            "label": "Task Title",
-            "label_for_customers": "Task Title",
-            "type": "custom_text",
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": True,
-        }
-        freshdesk_create_field(field=field)
-    else:
-        log.info("[green]Campo 'Task Title' già esistente.")
+def freshdesk_choices_fingerprint(values: list):
+    return hashlib.sha256(json.dumps(sorted(set(values))).encode("utf-8")).hexdigest()
 
 
-    # Gestione del campo 'Github Issue'
-    if not next(
-        (field for field in fields if field["name"] == "cf_github_issue"), False
-    ):
-        log.info("[yellow]Campo 'Github Issue' non trovato, tentativo di creazione.")
-        field = {
-            "label": "Github Issue",
-            "label_for_customers": "Github Issue",
-            "type": "custom_text",
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": False,
-        }
-        freshdesk_create_field(field=field)
-    else:
-        log.info("[green]Campo 'Github Issue' già esistente.")
+def freshdesk_provision_dropdown(fields: list, name: str, label: str, values: list):
+    # Crea il campo dropdown se manca e aggiunge con un solo PUT le scelte mancanti.
+    # Se l'insieme desiderato non è cambiato dall'ultimo run non serve nessuna chiamata.
+    fingerprint = freshdesk_choices_fingerprint(values)
+    field_exists = next((field for field in fields if field["name"] == name), False)
+    if field_exists and state_load("provisioning-" + name).get("fingerprint") == fingerprint:
+        log.info(f"[green]Campo '{label}' già aggiornato, nessuna modifica.")
+        return
 
-    # Gestione del campo 'Assigned Developer'
-    assigned_developer_field_exists = next(
-        (field for field in fields if field["name"] == "cf_assigned_developer"), False
-    )
-    
-    field_response_assigned_dev = None
-    if not assigned_developer_field_exists:
-        log.info("[yellow]Campo 'Assigned Developer' non trovato, tentativo di creazione.")
+    if not field_exists:
+        log.info(f"[yellow]Campo '{label}' non trovato, tentativo di creazione.")
         field = {
-            "label": "Assigned Developer",
-            "label_for_customers": "Assigned Developer",
+            "label": label,
+            "label_for_customers": label,
             "type": "custom_dropdown",
             "choices" : 
                 [
-                    {"value":"user1","position":1}
+                    {"label": "user1", "value":"user1","position":1}
                 ],
             "customers_can_edit": False,
             "required_for_closure": False,
@@ -841,239 +1597,840 @@ def get_create_fields(repos: dict):
             "required_for_customers": False,
             "displayed_to_customers": False,
         }
-        field_response_assigned_dev = freshdesk_create_field(field)
+        field_response = freshdesk_create_field(field)
+    else:
+        log.info(f"[green]Campo '{label}' già esistente, recupero informazioni.")
+        field_response = freshdesk_view_field(field_name=name, fields=fields)
+
+    if not field_response: # Procedi solo se field_response non è None
+        log.error(f"[red]Impossibile procedere con '{label}': campo non creato o recuperato.")
+        return
+
+    choices = list(freshdesk_get_field_choices(response=field_response))
+    existing_values = {c.get("value") for c in choices}
+    missing_values = [
+        v for v in dict.fromkeys(values) if v not in existing_values
+    ]
+    if missing_values:
+        next_position = max((c.get("position", 0) for c in choices), default=0) + 1
+        for position, value in enumerate(missing_values, start=next_position):
+            choices.append({"label": value, "value": value, "position": position})
+        updated_field = {"label": field_response["label"], "choices": choices}
+        if freshdesk_update_field(field_id=field_response["id"], field=updated_field) is None:
+            return
+    state_save("provisioning-" + name, {"fingerprint": fingerprint})
+    lease_keepalive()
+
+
+def freshdesk_provision_members(fields: list, members: list):
+    freshdesk_provision_dropdown(fields, "cf_assigned_developer", "Assigned Developer", members)
+
+
+def freshdesk_provision_statuses(fields: list, targets: list):
+    statuses = []
+    for target in targets:
+        for status in github_get_project_statuses(target["config"]):
+            if status not in statuses:
+                statuses.append(status)
+    freshdesk_provision_dropdown(fields, "cf_development_status", "Development Status", statuses)
+
+
+def freshdesk_provision_repos(fields: list, repos: list):
+    freshdesk_provision_dropdown(fields, "cf_repository", "Repository", repos)
+
+
+def github_load_project(target: dict):
+    config = target["config"]
+    log.info(f"[green]Sync target: tag '{config.tag}', project {config.project}")
+    target["project"] = github_get_project_fields(config)
+
+
+def github_load_cards(target: dict, repos: list, filtered: bool = False):
+    # Card del progetto di un target. Un progetto grande (o un run filtrato per repository)
+    # si carica con una slice per repository: il tempo dipende dal numero di slice in
+    # parallelo invece che dal numero di item. Le card di repository fuori dalla lista
+    # (archiviati o filtrati) non vengono caricate, quindi nemmeno il reverse sync le vede.
+    # Un progetto piccolo si legge di seguito, senza una query per ogni repository.
+    # In target["incomplete_repos"] i repository le cui card sono state caricate solo in parte.
+    config = target["config"]
+    slices = {f"repo:{org}/{repo}": repo for repo in repos}
+    if filtered:
+        target["cards"], incomplete = github_get_project_cards_sliced(config, list(slices))
+        target["incomplete_repos"] = [slices[q] for q in incomplete]
     else:
-        log.info("[green]Campo 'Assigned Developer' già esistente, recupero informazioni.")
-        field_response_assigned_dev = freshdesk_view_field(
-            field_name="cf_assigned_developer", fields=fields
+        cards, after_cursor, total_count = github_get_project_cards_page(config, "", "")
+        if after_cursor is None:
+            target["cards"] = cards
+            target["incomplete_repos"] = []
+        elif total_count <= github_slice_min_items:
+            rest, complete = github_get_project_cards(config, after_cursor=after_cursor)
+            target["cards"] = cards + rest
+            target["incomplete_repos"] = [] if complete else list(repos)
+        else:
+            target["cards"], incomplete = github_get_project_cards_sliced(config, list(slices))
+            target["incomplete_repos"] = [slices[q] for q in incomplete]
+    log.info(f"[green]Project {config.project}: {len(target['cards'])} cards loaded")
+
+
+def sync_configs_compile(targets: list, freshdesk_choices: Mapping):
+    for target in targets:
+        target["config"] = sync_config_compile(
+            target["config"], target["project"], freshdesk_choices
         )
 
-    if field_response_assigned_dev: # Procedi solo se field_response_assigned_dev non è None
-        field_id_assigned_dev = field_response_assigned_dev["id"]
-        field_choices_assigned_dev = freshdesk_get_field_choices(response=field_response_assigned_dev)
-        members = github_get_members()
-        updated_field_assigned_dev = None
-        for member in members:
-            if not freshdesk_field_choice_exists(
-                field_choices=field_choices_assigned_dev, choice=member
-            ):
-                updated_field_assigned_dev = freshdesk_add_field_choice(
-                    field=field_response_assigned_dev, field_choices=field_choices_assigned_dev, new_value=member
-                )
-        if updated_field_assigned_dev:
-            freshdesk_update_field(field_id=field_id_assigned_dev, field=updated_field_assigned_dev)
-    else:
-        log.error("[red]Impossibile procedere con 'Assigned Developer': campo non creato o recuperato.")
 
+def run_graph_task(function, dependencies: list):
+    return function(*[d.result() for d in dependencies])
 
-    # Gestione del campo 'Development Status'
-    development_status_field_exists = next(
-        (field for field in fields if field["name"] == "cf_development_status"), False
-    )
 
-    field_response_dev_status = None
-    if not development_status_field_exists:
-        log.info("[yellow]Campo 'Development Status' non trovato, tentativo di creazione.")
-        field = {
-            "label": "Development Status",
-            "label_for_customers": "Development Status",
-            "type": "custom_dropdown",
-            "choices" : 
-                [
-                    {"label": "user1", "value":"user1","position":1}
-                ],
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": False,
-        }
-        field_response_dev_status = freshdesk_create_field(field)
-    else:
-        log.info("[green]Campo 'Development Status' già esistente, recupero informazioni.")
-        field_response_dev_status = freshdesk_view_field(
-            field_name="cf_development_status", fields=fields
+def start_task_graph(tasks: dict):
+    # Ogni task parte appena sono pronti i task da cui dipende (dichiarati prima di lui),
+    # i task indipendenti girano in parallelo
+    executor = ThreadPoolExecutor(max_workers=len(tasks))
+    futures = {}
+    for name, (function, dependencies) in tasks.items():
+        futures[name] = executor.submit(
+            run_graph_task, function, [futures[d] for d in dependencies]
         )
-
-    if field_response_dev_status: # Procedi solo se field_response_dev_status non è None
-        field_id_dev_status = field_response_dev_status["id"]
-        field_choices_dev_status = freshdesk_get_field_choices(response=field_response_dev_status)
-        statuses = github_get_project_statuses(github_project_fields)
-        updated_field_dev_status = None
-        
-        # Correggi la logica di freshdesk_add_field_choice per aggiungere correttamente le scelte
-        current_choices_for_update = list(field_choices_dev_status) # Inizia con le scelte attuali
-        
-        for status in statuses:
-            if not freshdesk_field_choice_exists(
-                field_choices=current_choices_for_update, choice=status
-            ):
-                # Aggiungi la nuova scelta alla lista temporanea
-                max_position = 0
-                if current_choices_for_update:
-                    max_position = max(c.get("position", 0) for c in current_choices_for_update)
-                
-                new_choice = {
-                    "label": status,
-                    "value": status,
-                    "position": max_position + 1
-                }
-                current_choices_for_update.append(new_choice)
-                updated_field_dev_status = { # Prepara l'oggetto per l'aggiornamento
-                    "label": field_response_dev_status["label"],
-                    "choices": current_choices_for_update
-                }
-        
-        if updated_field_dev_status: # Se ci sono state aggiunte, aggiorna il campo
-            freshdesk_update_field(field_id=field_id_dev_status, field=updated_field_dev_status)
+    executor.shutdown(wait=False)
+    return futures
+
+
+def sync_ticket(repo: str, t: dict, cards: dict, config: SyncConfig):
+    synced_ticket_ids.add(t["id"])
+    t = freshdesk_get_ticket_summary(t)
+    if t["custom_fields"]["cf_github_issue"] == None:
+        if (t["custom_fields"]["cf_development_task_title"] != None) and (
+            t["custom_fields"]["cf_repository"] != None
+        ):
+            gh_issue = github_create_issue_with_card(
+                ticket=t,
+                repo=repo,
+                cards=cards,
+                company=freshdesk_get_company_name(ticket=t),
+                priority=freshdesk_resolve_priority(t["priority"], config=config),
+                config=config,
+            )
+            if gh_issue != {}: # Controlla se l'issue è stata creata con successo
+                freshdesk_update_ticket_ghissue(ticket=t, gh_issue=gh_issue)
+                freshdesk_add_note(gh_issue=gh_issue, ticket_id=t["id"], repo=repo)
+            else:
+                freshness_out_of_sync(t["id"], freshdesk_to_github, t["updated_at"])
     else:
-        log.error("[red]Impossibile procedere con 'Development Status': campo non creato o recuperato.")
+        gh_issue = github_get_issue(t["custom_fields"]["cf_github_issue"], repo)
+        if gh_issue: # Controlla se l'issue Github è stata recuperata
+            card = next(
+                (
+                    c
+                    for c in cards
+                    if (c["issue_number"] == gh_issue["number"])
+                    and (c["repository"] == repo)
+                ),
+                False,
+            )
+            if card: # Controlla se la card del progetto è stata trovata
+                newcard = github_update_issue(t, gh_issue, repo, card, config)
+                # Assicurati che newcard non sia None prima di procedere
+                if newcard:
+                    response = github_update_project_card(
+                        card=newcard,
+                        company=freshdesk_get_company_name(ticket=t),
+                        priority=freshdesk_resolve_priority(
+                            t["priority"], config=config
+                        ),
+                        config=config,
+                    )
+                    if response is not None and response.get("errors"):
+                        freshness_out_of_sync(t["id"], freshdesk_to_github, t["updated_at"])
+                    elif response is not None:
+                        freshness_written(t["id"], freshdesk_to_github, t["updated_at"])
+                    freshdesk_update_ticket_from_project(card=newcard, ticket=t, config=config)
+
+
+def work_priority(item: dict):
+    # Prima i ticket più urgenti, poi quelli ancora senza issue, poi i più recenti
+    t = item["ticket"]
+    updated_at = dt.datetime.fromisoformat(t["updated_at"].replace("Z", "+00:00"))
+    return (
+        -(t.get("priority") or 0),
+        t["custom_fields"]["cf_github_issue"] != None,
+        -updated_at.timestamp(),
+    )
 
 
-    # Gestione del campo 'Repository'
-    repository_field_exists = next(
-        (field for field in fields if field["name"] == "cf_repository"), False
-    )
+def deadline_reached(deadline, expected_seconds: float = 0):
+    if deadline is None:
+        return False
+    return time.monotonic() + expected_seconds + sync_deadline_margin > deadline
+
+
+def schedule_work(targets: list, repos: list, deadline):
+    # Raccoglie i ticket di tutti i target e repository, ordinati per urgenza
+    work = []
+    remaining = {}
+    unsearched = []
+    for target in targets:
+        config = target["config"]
+        for repo in repos:
+            if checkpoint_repo_completed(repo, config):
+                log.info("[green]Skipping completed Repository " + repo)
+                continue
+            if deadline_reached(deadline):
+                unsearched.append(repo)
+                continue
+            tickets = [
+                t
+                for t in freshdesk_get_tickets(repo, config)
+                if not checkpoint_ticket_completed(repo, t["id"], config)
+            ]
+            if not tickets:
+                checkpoint_repo_done(repo, config)
+                continue
+            remaining[checkpoint_key(repo, config)] = len(tickets)
+            for t in tickets:
+                work.append({"target": target, "repo": repo, "ticket": t})
+    return sorted(work, key=work_priority), remaining, unsearched
 
-    field_response_repo = None
-    if not repository_field_exists:
-        log.info("[yellow]Campo 'Repository' non trovato, tentativo di creazione.")
-        field = {
-            "label": "Repository",
-            "label_for_customers": "Repository",
-            "type": "custom_dropdown",
-            "choices" : 
-                [
-                    {"value":"user1","position":1}
-                ],
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": False,
-        }
-        # ATTENZIONE: Qui c'era un errore, passava updated_field invece di field
-        field_response_repo = freshdesk_create_field(field) 
-    else:
-        log.info("[green]Campo 'Repository' già esistente, recupero informazioni.")
-        field_response_repo = freshdesk_view_field(field_name="cf_repository", fields=fields)
-
-    if field_response_repo: # Procedi solo se field_response_repo non è None
-        field_id_repo = field_response_repo["id"]
-        field_choices_repo = freshdesk_get_field_choices(response=field_response_repo)
-        
-        current_choices_for_update_repo = list(field_choices_repo) # Inizia con le scelte attuali
-        updated_field_repo = None # Reset dell'updated_field per questo blocco
-        
-        for repo_name in repos: # Rinominato 'repo' in 'repo_name' per evitare shadowing
-            if not freshdesk_field_choice_exists(field_choices=current_choices_for_update_repo, choice=repo_name):
-                max_position = 0
-                if current_choices_for_update_repo:
-                    max_position = max(c.get("position", 0) for c in current_choices_for_update_repo)
-                
-                new_choice = {
-                    "label": repo_name,
-                    "value": repo_name,
-                    "position": max_position + 1
-                }
-                current_choices_for_update_repo.append(new_choice)
-                updated_field_repo = { # Prepara l'oggetto per l'aggiornamento
-                    "label": field_response_repo["label"],
-                    "choices": current_choices_for_update_repo
-                }
-        
-        if updated_field_repo: # Se ci sono state aggiunte, aggiorna il campo
-            freshdesk_update_field(field_id=field_id_repo, field=updated_field_repo)
-    else:
-        log.error("[red]Impossibile procedere con 'Repository': campo non creato o recuperato.")
 
+def target_for_project(targets: list, project: str):
+    return next((t for t in targets if t["config"].project == project), None)
 
-    # Gestione del campo 'Start Date'
-    if not next((field for field in fields if field["name"] == "cf_start_date"), False):
-        log.info("[yellow]Campo 'Start Date' non trovato, tentativo di creazione.")
-        field = {
-            "label": "Start Date",
-            "label_for_customers": "Start Date",
-            "type": "custom_date",
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": True,
-        }
-        freshdesk_create_field(field=field)
-    else:
-        log.info("[green]Campo 'Start Date' già esistente.")
 
-    # Gestione del campo 'End Date'
-    if not next((field for field in fields if field["name"] == "cf_end_date"), False):
-        log.info("[yellow]Campo 'End Date' non trovato, tentativo di creazione.")
-        field = {
-            "label": "End Date",
-            "label_for_customers": "End Date",
-            "type": "custom_date",
-            "customers_can_edit": False,
-            "required_for_closure": False,
-            "required_for_agents": False,
-            "required_for_customers": False,
-            "displayed_to_customers": True,
-        }
-        freshdesk_create_field(field=field)
+def target_for_ticket(targets: list, ticket: dict):
+    return next(
+        (t for t in targets if t["config"].tag in ticket.get("tags", [])), targets[0]
+    )
+
+
+def schedule_scoped_work(targets: list, scope: dict):
+    # Lavoro per singoli ticket o per un singolo item di progetto, senza ricerche
+    if scope.get("item"):
+        item = github_get_project_item(scope["item"])
+        if item is None:
+            return [], {}, []
+        project, project_id, node = item
+        item_target = target_for_project(targets, project)
+        if item_target is None:
+            log.error(f"[red]L'item {scope['item']} non appartiene a nessun progetto configurato.")
+            return [], {}, []
+        card = github_parse_project_item(node, project_id, item_target["config"])
+        if card is None:
+            log.warning(f"[yellow]L'item {scope['item']} non è collegato a una issue, ignorato.")
+            return [], {}, []
+        item_target["cards"].append(card)
+        ticket_ids = [card_ticket_id(card)] if card_ticket_id(card) else []
     else:
-        log.info("[green]Campo 'End Date' già esistente.")
+        ticket_ids = scope["tickets"]
+    tickets = freshdesk_get_tickets_by_id(ticket_ids)
+    work = []
+    remaining = {}
+    for t in tickets.values():
+        repo = t["custom_fields"]["cf_repository"]
+        if not repo:
+            log.warning(f"[yellow]Il ticket {t['id']} non ha un repository, ignorato.")
+            continue
+        if scope.get("item"):
+            target = item_target
+        else:
+            target = target_for_ticket(targets, t)
+        if not scope.get("item") and t["custom_fields"]["cf_github_issue"]:
+            for project, project_id, node in github_get_issue_project_items(
+                repo, t["custom_fields"]["cf_github_issue"]
+            ):
+                card_target = target_for_project(targets, project)
+                if card_target is None:
+                    continue
+                card = github_parse_project_item(node, project_id, card_target["config"])
+                if card is not None:
+                    card_target["cards"].append(card)
+        key = checkpoint_key(repo, target["config"])
+        remaining[key] = remaining.get(key, 0) + 1
+        work.append({"target": target, "repo": repo, "ticket": t})
+    return sorted(work, key=work_priority), remaining, []
+
+
+def run_scheduled_work(work: list, remaining: dict, deadline):
+    deferred = []
+    average_seconds = 0.0
+    for i, item in enumerate(work):
+        if deadline_reached(deadline, expected_seconds=average_seconds):
+            deferred = work[i:]
+            break
+        target = item["target"]
+        config = target["config"]
+        started = time.monotonic()
+        sync_ticket(item["repo"], item["ticket"], target["cards"], config)
+        freshness_checked(item["ticket"]["id"], freshdesk_to_github)
+        checkpoint_ticket_done(item["repo"], item["ticket"]["id"], config)
+        key = checkpoint_key(item["repo"], config)
+        remaining[key] -= 1
+        if remaining[key] == 0:
+            checkpoint_repo_done(item["repo"], config)
+        # Media mobile della durata di un ticket, per fermarsi prima della scadenza
+        elapsed = time.monotonic() - started
+        average_seconds = elapsed if i == 0 else 0.8 * average_seconds + 0.2 * elapsed
+    return deferred
+
+
+def card_ticket_id(card: dict):
+    match = re.search(r"\(FD#(\d+)\)\s*$", card["title"])
+    if match:
+        return int(match.group(1))
+    return None
+
 
-    return fields, github_project_fields
+def card_fingerprint(card: dict, config: SyncConfig):
+    return json.dumps(
+        [
+            card.get(config.status_field),
+            card.get("assignee"),
+            card.get(config.iteration_field),
+            card.get("iteration_end"),
+        ]
+    )
 
 
-def create_update_github_issues(fd_fields, gh_fields: dict, repo: str, cards: dict):
-    log.info("[green]Starting sync for Repository " + repo)
-    tickets = freshdesk_get_tickets(repo)
-    for t in tickets:
-        t = freshdesk_get_ticket_summary(t)
-        if t["custom_fields"]["cf_github_issue"] == None:
-            if (t["custom_fields"]["cf_development_task_title"] != None) and (
-                t["custom_fields"]["cf_repository"] != None
+def card_updated_timestamp(card: dict):
+    if not card.get("updated_at"):
+        return None
+    return dt.datetime.fromisoformat(card["updated_at"].replace("Z", "+00:00")).timestamp()
+
+
+def reverse_sync_cards(targets: list, deadline, run_started: float, full_run: bool = True):
+    # Github→Freshdesk guidato dalle card: legge solo i ticket delle card i cui
+    # campi sono cambiati dall'ultimo run, senza ricerche per repository.
+    # Restituisce lo stato da salvare (impronte delle card, inizio del run, card rimandate)
+    # e le impronte delle card con un aggiornamento in coda, da confermare dopo il flush.
+    state = state_load("reverse_sync")
+    fingerprints = state.get("items", {})
+    last_run = state.get("last_run")
+    retry = set(state.get("deferred", []))
+    new_state = {"last_run": run_started, "items": fingerprints, "deferred": []}
+    pending = {}
+    if not full_run:
+        # Un run filtrato vede solo una parte delle card: l'ultimo run completo resta il riferimento
+        new_state.update(last_run=last_run, deferred=list(retry))
+    if full_run and last_run is None:
+        # Primo run completo, o stato non conservato: si registrano le card senza leggere i ticket
+        for target in targets:
+            for card in target["cards"]:
+                fingerprints[card["item_id"]] = card_fingerprint(card, target["config"])
+        log.info(f"[green]Reverse sync: no previous state, {len(fingerprints)} project items recorded")
+        return new_state, pending
+    changed = {}
+    for target in targets:
+        config = target["config"]
+        for card in target["cards"]:
+            ticket_id = card_ticket_id(card)
+            if ticket_id is None:
+                continue
+            fingerprint = card_fingerprint(card, config)
+            if fingerprints.get(card["item_id"]) == fingerprint:
+                continue
+            if ticket_id in synced_ticket_ids:
+                # Già sincronizzata in questo run: vale se la sua scrittura va a buon fine
+                pending[card["item_id"]] = (ticket_id, fingerprint)
+                continue
+            updated_at = card_updated_timestamp(card)
+            if (
+                card["item_id"] not in retry
+                and last_run is not None
+                and updated_at is not None
+                and updated_at < last_run - reverse_sync_clock_margin
             ):
-                gh_issue = github_create_issue(t, repo)
-                if gh_issue != {}: # Controlla se l'issue è stata creata con successo
-                    freshdesk_update_ticket_ghissue(ticket=t, gh_issue=gh_issue)
-                    freshdesk_add_note(gh_issue=gh_issue, ticket_id=t["id"], repo=repo)
+                # Non modificata dall'ultimo run
+                fingerprints[card["item_id"]] = fingerprint
+                continue
+            changed[ticket_id] = (config, card, fingerprint)
+    if not changed:
+        return new_state, pending
+    # Le card modificate più di recente per prime, fino al limite di letture del run
+    ordered = sorted(
+        changed.items(), key=lambda c: -(card_updated_timestamp(c[1][1]) or 0)
+    )
+    if deadline_reached(deadline):
+        selected, deferred = [], ordered
+    else:
+        selected, deferred = ordered[:reverse_sync_max_reads], ordered[reverse_sync_max_reads:]
+    if deferred:
+        log.warning(f"[yellow]Reverse sync: {len(deferred)} changed project items deferred to the next run")
+        for ticket_id, (config, card, fingerprint) in deferred:
+            freshness_pending(ticket_id, github_to_freshdesk, card.get("updated_at"))
+            if card["item_id"] not in new_state["deferred"]:
+                new_state["deferred"].append(card["item_id"])
+    if not selected:
+        return new_state, pending
+    log.info(f"[yellow]Reverse sync: {len(selected)} changed project items")
+    tickets = freshdesk_get_tickets_by_id([ticket_id for ticket_id, _ in selected])
+    for ticket_id, (config, card, fingerprint) in selected:
+        if ticket_id not in tickets:
+            # Lettura fallita: la card torna al prossimo run
+            freshness_pending(ticket_id, github_to_freshdesk, card.get("updated_at"))
+            new_state["deferred"].append(card["item_id"])
+            continue
+        if freshdesk_update_ticket_from_project(card=card, ticket=tickets[ticket_id], config=config):
+            pending[card["item_id"]] = (ticket_id, fingerprint)
         else:
-            gh_issue = github_get_issue(t["custom_fields"]["cf_github_issue"], repo)
-            if gh_issue: # Controlla se l'issue Github è stata recuperata
-                card = next(
-                    (
-                        c
-                        for c in cards
-                        if (c["issue_number"] == gh_issue["number"])
-                        and (c["repository"] == repo)
-                    ),
-                    False,
-                )
-                if card: # Controlla se la card del progetto è stata trovata
-                    newcard = github_update_issue(t, gh_issue, repo, card)
-                    # Assicurati che newcard non sia None prima di procedere
-                    if newcard:
-                        github_update_project_card(
-                            card=newcard,
-                            company=freshdesk_get_company_name(ticket=t),
-                            priority=freshdesk_resolve_priority(
-                                t["priority"], fields=fd_fields
-                            ),
-                            fields=gh_fields,
-                        )
-                        freshdesk_update_ticket_from_project(card=newcard, ticket=t)
-    log.info("[green]Ending sync for Repository " + repo)
+            fingerprints[card["item_id"]] = fingerprint
+    return new_state, pending
 
 
-if __name__ == "__main__":
-    repos = github_get_repos()
-    cards = github_get_project_cards()
-    fd_fields, gh_fields = get_create_fields(repos)
+def reverse_sync_confirm(state: dict, pending: dict, failed_ids: set):
+    # Dopo il flush: impronte solo per le scritture riuscite, le altre card tornano al prossimo run
+    for item_id, (ticket_id, fingerprint) in pending.items():
+        if ticket_id in failed_ids:
+            if item_id not in state["deferred"]:
+                state["deferred"].append(item_id)
+        else:
+            state["items"][item_id] = fingerprint
+    return state
+
+
+def report_deferred(deferred: list, unsearched: list):
+    if not deferred and not unsearched:
+        return
+    by_repo = {}
+    for item in deferred:
+        by_repo.setdefault(item["repo"], []).append(str(item["ticket"]["id"]))
+    for repo in unsearched:
+        by_repo.setdefault(repo, []).append("not searched")
+    log.warning(
+        f"[yellow]Run budget exhausted: {len(deferred)} tickets and {len(unsearched)} repository searches deferred to the next run"
+    )
+    for repo, ticket_ids in by_repo.items():
+        log.warning(f"[yellow]  {repo}: {', '.join(ticket_ids)}")
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if summary_path:
+        with open(summary_path, "a", encoding="utf-8") as f:
+            f.write(
+                f"### Freshdesk sync: {len(deferred)} tickets and {len(unsearched)} repository searches deferred\n\n"
+            )
+            for repo, ticket_ids in by_repo.items():
+                f.write(f"- {repo}: {', '.join(ticket_ids)}\n")
+
+
+def run_sync(budget=None, provision: bool = True, sync: bool = True, scope: dict = None):
+    run_started = time.time()
+    deadline = time.monotonic() + budget if budget else None
+    scope = scope or {}
+    targeted = bool(scope.get("tickets") or scope.get("item"))
+    targets = load_sync_targets()
+    # Ogni filtro salta le letture dell'intera organizzazione che non gli servono
+    tasks = {"fd_fields": (freshdesk_get_fields, [])}
+    if scope.get("repos"):
+        tasks["repos"] = (lambda: scope["repos"], [])
+    elif not targeted:
+        tasks["repos"] = (github_get_repos, [])
+    # I progetti dei target vengono caricati in parallelo; con un filtro per ticket
+    # o item le card vengono lette dopo, una per una
+    project_tasks = []
+    card_tasks = []
+    for i, target in enumerate(targets):
+        project_tasks.append(f"project_{i}")
+        tasks[f"project_{i}"] = (lambda target=target: github_load_project(target), [])
+        if sync and not targeted:
+            card_tasks.append(f"cards_{i}")
+            tasks[f"cards_{i}"] = (
+                lambda repos, target=target: github_load_cards(
+                    target, repos, filtered=bool(scope.get("repos"))
+                ),
+                ["repos"],
+            )
+    tasks["fd_choices"] = (freshdesk_get_choices, ["fd_fields"])
+    tasks["configs"] = (
+        lambda freshdesk_choices, *projects: sync_configs_compile(targets, freshdesk_choices),
+        ["fd_choices"] + project_tasks,
+    )
+    if provision:
+        tasks["members"] = (github_get_members, [])
+        tasks["static_fields"] = (freshdesk_provision_static_fields, ["fd_fields"])
+        tasks["provision_members"] = (freshdesk_provision_members, ["fd_fields", "members"])
+        tasks["provision_statuses"] = (
+            lambda fields, configs: freshdesk_provision_statuses(fields, targets),
+            ["fd_fields", "configs"],
+        )
+        tasks["provision_repos"] = (freshdesk_provision_repos, ["fd_fields", "repos"])
+    if sync and targeted:
+        tasks["work"] = (lambda configs: schedule_scoped_work(targets, scope), ["configs"])
+    elif sync:
+        tasks["work"] = (lambda repos: schedule_work(targets, repos, deadline), ["repos"])
+    startup = start_task_graph(tasks)
+
+    if not sync:
+        for task in startup.values():
+            task.result()
+        return []
+
+    freshness_load()
+    work, remaining, unsearched = startup["work"].result()
+    startup["configs"].result()
+    for name in card_tasks:
+        startup[name].result()
+    # Senza tutte le card di un repository i suoi ticket non si possono confrontare
+    # con il progetto: passano al prossimo run insieme al lavoro oltre la scadenza
+    incomplete = []
+    complete = []
+    for item in work:
+        if item["repo"] in item["target"].get("incomplete_repos", []):
+            incomplete.append(item)
+        else:
+            complete.append(item)
+    work = complete
+    if incomplete:
+        log.warning(f"[yellow]{len(incomplete)} tickets deferred: project cards of their repository only partly loaded")
+    if provision:
+        startup["static_fields"].result()
     # Aggiunto controllo per assicurarsi che i campi siano stati recuperati/creati correttamente
-    if fd_fields is None or gh_fields is None:
+    if any(t["config"].project_id is None for t in targets):
         log.error("[red]Errore critico: Impossibile recuperare o creare i campi Freshdesk/Github. Uscita.")
         exit(1) # Termina lo script con un codice di errore
-        
-    for repo in repos:
-        create_update_github_issues(fd_fields, gh_fields, repo, cards)
+
+    log.info(f"[green]Scheduled {len(work)} tickets for sync")
+    deferred = run_scheduled_work(work, remaining, deadline) + incomplete
+    for item in deferred:
+        freshness_pending(item["ticket"]["id"], freshdesk_to_github, item["ticket"]["updated_at"])
+    # Con card caricate solo in parte il run non fa da riferimento per il prossimo:
+    # le card saltate, modificate prima di questo run, non verrebbero più lette
+    reverse_sync_state, reverse_sync_pending = reverse_sync_cards(
+        targets,
+        deadline,
+        run_started,
+        full_run=not any(scope.values())
+        and not any(t.get("incomplete_repos") for t in targets),
+    )
+    # Le scelte dei dropdown devono esistere prima di scrivere i ticket
+    for task in startup.values():
+        task.result()
+    failed_ids = freshdesk_flush_ticket_updates(deadline)
+    # Il checkpoint di un run con lavoro rimandato non deve riproporre gli aggiornamenti inviati
+    checkpoint_save()
+    # Senza lease (run per ticket o item) lo stato condiviso resta quello del run completo
+    if lease_held:
+        state_save("reverse_sync", reverse_sync_confirm(reverse_sync_state, reverse_sync_pending, failed_ids))
+    freshness_export(save_state=lease_held)
+    report_deferred(deferred, unsearched)
+    # Aggiornamenti Freshdesk rimasti in coda: il checkpoint deve restare per il prossimo run
+    return deferred + unsearched + list(freshdesk_ticket_update_queue)
+
+
+# Backfill: creazione massiva delle issue per i ticket di un nuovo tag.
+# Il journal tiene i ticket in corso ("creating", "created") e le creazioni dell'ultima
+# ora; un ticket completato esce dal journal perché ha già cf_github_issue.
+backfill_journal = {"tickets": {}, "created_at": []}
+backfill_lock = threading.Lock()
+
+
+def backfill_journal_save():
+    lease_keepalive()
+    with backfill_lock:
+        state_save("backfill", backfill_journal)
+
+
+def backfill_journal_set(ticket_id, entry: dict):
+    with backfill_lock:
+        if entry is None:
+            backfill_journal["tickets"].pop(str(ticket_id), None)
+        else:
+            backfill_journal["tickets"][str(ticket_id)] = entry
+    backfill_journal_save()
+
+
+def backfill_pace(per_minute: int, per_hour: int, deadline=None, expected_seconds: float = 0):
+    # Attende finché una nuova creazione sta nei limiti per minuto e per ora.
+    # Restituisce False, senza attendere, se l'attesa andrebbe oltre la scadenza del run
+    while True:
+        now = time.time()
+        with backfill_lock:
+            created_at = [t for t in backfill_journal["created_at"] if t > now - 3600]
+            backfill_journal["created_at"] = created_at
+        last_minute = [t for t in created_at if t > now - 60]
+        wait = 0
+        if len(last_minute) >= per_minute:
+            wait = max(wait, last_minute[-per_minute] + 60 - now)
+        if len(created_at) >= per_hour:
+            wait = max(wait, created_at[-per_hour] + 3600 - now)
+        if wait <= 0:
+            return True
+        if deadline_reached(deadline, expected_seconds=wait + expected_seconds):
+            return False
+        # Attese lunghe a tratti, rinnovando il lease: un backfill dura ore
+        time.sleep(min(wait, sync_lease_ttl / 3))
+        lease_keepalive()
+
+
+def backfill_write_ticket(ticket_id, repo: str, entry: dict):
+    # Scritture Freshdesk di un'issue creata, in coda dietro alle creazioni
+    gh_issue = entry["gh_issue"]
+    if not entry.get("ghissue_written"):
+        if freshdesk_update_ticket_ghissue(ticket={"id": ticket_id}, gh_issue=gh_issue) is None:
+            return False
+        entry = dict(entry, ghissue_written=True)
+        backfill_journal_set(ticket_id, entry)
+    if freshdesk_add_note(gh_issue=gh_issue, ticket_id=ticket_id, repo=repo) is None:
+        return False
+    backfill_journal_set(ticket_id, None)
+    return True
+
+
+def backfill_recover(writer: ThreadPoolExecutor):
+    # Ticket rimasti a metà da un run interrotto: nessuna issue viene creata due volte
+    futures = []
+    for ticket_id, entry in list(backfill_journal["tickets"].items()):
+        if entry["state"] == "creating":
+            gh_issue = github_find_ticket_issue(entry["repo"], ticket_id, entry.get("since"))
+            if gh_issue is False:
+                # Verifica non riuscita: il ticket resta "creating" fino al prossimo run
+                log.warning(f"[yellow]Backfill: issue of ticket {ticket_id} not checked, retried on the next run")
+                continue
+            if gh_issue is None:
+                backfill_journal_set(ticket_id, None)
+                continue
+            entry = {"state": "created", "repo": entry["repo"], "gh_issue": gh_issue}
+            backfill_journal_set(ticket_id, entry)
+        futures.append(writer.submit(backfill_write_ticket, ticket_id, entry["repo"], entry))
+    if futures:
+        log.info(f"[green]Backfill: resuming {len(futures)} interrupted tickets")
+    return futures
+
+
+def backfill_schedule(targets: list, repos: list):
+    # Ticket ancora senza issue di tutti i target e repository, cercati in parallelo
+    searches = [(target, repo) for target in targets for repo in repos]
+    with ThreadPoolExecutor(max_workers=freshdesk_read_workers) as executor:
+        results = executor.map(
+            lambda search: freshdesk_get_tickets(search[1], search[0]["config"]), searches
+        )
+        work = []
+        for (target, repo), tickets in zip(searches, results):
+            for t in tickets:
+                if (
+                    t["custom_fields"]["cf_github_issue"] == None
+                    and t["custom_fields"]["cf_development_task_title"] != None
+                    and str(t["id"]) not in backfill_journal["tickets"]
+                ):
+                    work.append({"target": target, "repo": repo, "ticket": t})
+    return sorted(work, key=work_priority)
+
+
+def backfill_read_ahead(work: list):
+    # Summary dei ticket letti in anticipo rispetto alle creazioni
+    with ThreadPoolExecutor(max_workers=freshdesk_read_workers) as executor:
+        items = iter(work)
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(freshdesk_get_ticket_summary, item["ticket"])))
+            if len(pending) >= 2 * freshdesk_read_workers:
+                break
+        while pending:
+            item, future = pending.popleft()
+            next_item = next(items, None)
+            if next_item is not None:
+                pending.append(
+                    (next_item, executor.submit(freshdesk_get_ticket_summary, next_item["ticket"]))
+                )
+            yield item, future.result()
+
+
+def backfill_report(stats: dict, total: int, final: bool = False):
+    elapsed = max(time.monotonic() - stats["started"], 1)
+    rate = stats["created"] / elapsed * 60
+    left = total - stats["created"] - stats["failed"]
+    eta = f", ETA {left / rate:.0f} min" if rate and left > 0 else ""
+    message = f"Backfill: {stats['created']}/{total} issues created, {stats['failed']} failed, {rate:.1f}/min{eta}"
+    log.info("[green]" + message)
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if final and summary_path:
+        with open(summary_path, "a", encoding="utf-8") as f:
+            f.write(f"### {message}\n")
+
+
+def run_backfill(budget=None, scope: dict = None, per_minute: int = None, per_hour: int = None):
+    deadline = time.monotonic() + budget if budget else None
+    scope = scope or {}
+    per_minute = per_minute or github_create_per_minute
+    per_hour = per_hour or github_create_per_hour
+    targets = load_sync_targets()
+    tasks = {"fd_fields": (freshdesk_get_fields, [])}
+    if scope.get("repos"):
+        tasks["repos"] = (lambda: scope["repos"], [])
+    else:
+        tasks["repos"] = (github_get_repos, [])
+    project_tasks = []
+    for i, target in enumerate(targets):
+        project_tasks.append(f"project_{i}")
+        tasks[f"project_{i}"] = (lambda target=target: github_load_project(target), [])
+    tasks["fd_choices"] = (freshdesk_get_choices, ["fd_fields"])
+    tasks["configs"] = (
+        lambda freshdesk_choices, *projects: sync_configs_compile(targets, freshdesk_choices),
+        ["fd_choices"] + project_tasks,
+    )
+    tasks["static_fields"] = (freshdesk_provision_static_fields, ["fd_fields"])
+    startup = start_task_graph(tasks)
+    for task in startup.values():
+        task.result()
+    if any(t["config"].project_id is None for t in targets):
+        log.error("[red]Errore critico: Impossibile recuperare o creare i campi Freshdesk/Github. Uscita.")
+        exit(1)
+
+    backfill_journal.update(state_load("backfill"))
+    writer = ThreadPoolExecutor(max_workers=freshdesk_backfill_workers)
+    writes = backfill_recover(writer)
+    work = backfill_schedule(targets, startup["repos"].result())
+    log.info(f"[green]Backfill: {len(work)} tickets without a Github issue")
+    stats = {"created": 0, "failed": 0, "started": time.monotonic()}
+    deferred = []
+    average_seconds = 0.0
+    for i, (item, t) in enumerate(backfill_read_ahead(work)):
+        if deadline_reached(deadline, expected_seconds=average_seconds):
+            deferred = work[i:]
+            break
+        if not backfill_pace(per_minute, per_hour, deadline, expected_seconds=average_seconds):
+            log.warning("[yellow]Backfill: the next creation slot is past the run budget")
+            deferred = work[i:]
+            break
+        started = time.monotonic()
+        config = item["target"]["config"]
+        # Margine sull'orologio di Github per ritrovare l'issue se il run si interrompe
+        since = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=5)
+        backfill_journal_set(
+            t["id"],
+            {"state": "creating", "repo": item["repo"], "since": since.strftime("%Y-%m-%dT%H:%M:%SZ")},
+        )
+        try:
+            gh_issue = github_create_issue_with_card(
+                ticket=t,
+                repo=item["repo"],
+                cards=item["target"]["cards"],
+                company=freshdesk_get_company_name(ticket=t),
+                priority=freshdesk_resolve_priority(t["priority"], config=config),
+                config=config,
+            )
+        except Exception as e:
+            # Probabile limite secondario: il ticket resta "creating" e viene
+            # verificato al prossimo run, intanto si rallenta
+            log.warning(f"[yellow]Backfill: creazione per il ticket {t['id']} fallita ({e}), pausa di {github_create_retry_wait}s")
+            stats["failed"] += 1
+            if deadline_reached(deadline, expected_seconds=github_create_retry_wait + average_seconds):
+                deferred = work[i + 1 :]
+                break
+            time.sleep(github_create_retry_wait)
+            continue
+        with backfill_lock:
+            backfill_journal["created_at"].append(time.time())
+        if gh_issue == {}:
+            backfill_journal_set(t["id"], None)
+            stats["failed"] += 1
+            continue
+        entry = {"state": "created", "repo": item["repo"], "gh_issue": gh_issue}
+        backfill_journal_set(t["id"], entry)
+        writes.append(writer.submit(backfill_write_ticket, t["id"], item["repo"], entry))
+        stats["created"] += 1
+        if stats["created"] % backfill_report_every == 0:
+            backfill_report(stats, len(work))
+        elapsed = time.monotonic() - started
+        average_seconds = elapsed if i == 0 else 0.8 * average_seconds + 0.2 * elapsed
+    writer.shutdown(wait=True)
+    failed_writes = sum(1 for w in writes if not w.result())
+    if failed_writes:
+        log.warning(f"[yellow]Backfill: {failed_writes} Freshdesk updates failed, retried on the next run")
+    backfill_journal_save()
+    backfill_report(stats, len(work), final=True)
+    report_deferred(deferred, [])
+    return deferred
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync Freshdesk tickets with Github issues and projects")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from its last checkpoint",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=sync_run_budget,
+        help="run time budget in seconds; the most urgent tickets are synced first",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", help="provision the Freshdesk fields and sync all tickets (default)")
+    subparsers.add_parser("provision", help="only create and update the Freshdesk fields")
+    sync_parser = subparsers.add_parser("sync", help="only sync tickets, optionally restricted by the filters below")
+    sync_parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="sync only this repository (can be repeated)",
+    )
+    sync_parser.add_argument(
+        "--ticket",
+        action="append",
+        type=int,
+        default=[],
+        help="sync only this Freshdesk ticket id (can be repeated)",
+    )
+    sync_parser.add_argument("--item", help="sync only this Github project item (node id)")
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="create the Github issues of all tickets that have none yet, paced to Github's limits"
+    )
+    backfill_parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="backfill only this repository (can be repeated)",
+    )
+    backfill_parser.add_argument(
+        "--per-minute",
+        type=int,
+        default=github_create_per_minute,
+        help="maximum issues created per minute",
+    )
+    backfill_parser.add_argument(
+        "--per-hour",
+        type=int,
+        default=github_create_per_hour,
+        help="maximum issues created per hour",
+    )
+    args = parser.parse_args()
+
+    command = args.command or "run"
+    scope = {
+        "repos": getattr(args, "repo", []),
+        "tickets": getattr(args, "ticket", []),
+        "item": getattr(args, "item", None),
+    }
+    # I run per singoli ticket o item non aspettano il lease del run completo
+    targeted = bool(scope["tickets"] or scope["item"])
+    if not targeted and not lease_acquire(sync_lease_ttl):
+        log.warning("[yellow]Un altro run di sync è ancora in corso, uscita.")
+        exit(0)
+    lease_held = not targeted
+    try:
+        checkpoint_start(
+            resume=args.resume,
+            enabled=command not in ("provision", "backfill") and not any(scope.values()),
+        )
+        if command == "backfill":
+            deferred = run_backfill(
+                budget=args.budget,
+                scope=scope,
+                per_minute=args.per_minute,
+                per_hour=args.per_hour,
+            )
+        else:
+            deferred = run_sync(
+                budget=args.budget,
+                provision=command != "sync",
+                sync=command != "provision",
+                scope=scope,
+            )
+        if not deferred:
+            checkpoint_finish()
+    except LeaseLost as e:
+        # Un altro run ha preso il lease scaduto: fermarsi senza salvare altro stato
+        log.error(f"[red]{e}, uscita.")
+        exit(1)
+    finally:
+        if not targeted:
+            lease_release()
+        github_credentials_report()